@@ -2,12 +2,12 @@
 # -*- coding: utf-8 -*-
 import sys
 from PySide6.QtWidgets import QApplication
-from artfusion.mainwindow import ArtFusion
+from artfusion.mainwindow import ArtFusion, rotate_session
 
 
 def main():
     app = QApplication(sys.argv)
-    win = ArtFusion()
+    win = ArtFusion(previous_session=rotate_session())
     win.show()
     sys.exit(app.exec())
 
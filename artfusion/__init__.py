@@ -4,4 +4,28 @@ __all__ = [
     "ops",
     "imageview",
     "mainwindow",
-]
\ No newline at end of file
+    "render",
+    "pyramid",
+    "history",
+    "tiles",
+    "batch",
+    "recipe",
+    "cache",
+    "blend",
+    "bench",
+    "instrument",
+    "loader",
+    "export",
+    "procpool",
+    "variants",
+    "project",
+    "pipeline",
+]
+
+
+def __getattr__(name):
+    # submodules load on first access, so `import artfusion` stays cheap and Qt-free
+    if name in __all__:
+        import importlib
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -0,0 +1,184 @@
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from .ops import Ops
+from .recipe import Recipe, parse_params
+from .utils import load_image, save_image
+from .procpool import get_pool
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+_refs = {}  # per-process cache of reference images (reinhard/otsu/blend "other")
+
+
+def _ref(path):
+    img = _refs.get(path)
+    if img is None:
+        img = load_image(path)
+        if img is None:
+            raise ValueError(f"cannot read reference image {path}")
+        img.setflags(write=False)  # lets blend/composite reuse their resized copy across inputs
+        _refs[path] = img
+    return img
+
+
+# step name -> callable(img, **params); params naming an image take a path
+STEPS = {
+    "adjust": Ops.adjust,
+    "grayscale": Ops.grayscale,
+    "sepia": Ops.sepia,
+    "blur": Ops.blur,
+    "sharpen": Ops.sharpen,
+    "edges": Ops.edges,
+    "cartoon": Ops.cartoon,
+    "vignette": Ops.vignette,
+    "glow": Ops.glow,
+    "reinhard": lambda img, ref, strength=1.0: Ops.reinhard_color_transfer(img, _ref(ref), strength),
+    "otsu": lambda img, other, invert=False, feather=0: Ops.otsu_composite(img, _ref(other), invert, feather),
+    "blend": lambda img, other, mode="normal", alpha=0.5: Ops.blend(img, _ref(other), mode=mode, alpha=alpha),
+}
+
+
+def parse_step(text):
+    """'name' or 'name:key=value,key=value' -> (name, params)."""
+    name, _, rest = text.partition(":")
+    name = name.strip()
+    if name not in STEPS:
+        raise argparse.ArgumentTypeError(f"unknown step '{name}' (choose from {', '.join(STEPS)})")
+    try:
+        params = parse_params(rest)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"step '{text}': {e}")
+    return name, params
+
+
+def collect_inputs(patterns):
+    files = []
+    for pat in patterns:
+        if os.path.isdir(pat):
+            names = sorted(os.listdir(pat))
+            files += [os.path.join(pat, n) for n in names if n.lower().endswith(IMAGE_EXTS)]
+        else:
+            files += sorted(glob.glob(pat, recursive=True))
+    return [f for f in dict.fromkeys(files) if os.path.isfile(f)]
+
+
+def output_path(src, out_dir, suffix="", ext=None):
+    stem, src_ext = os.path.splitext(os.path.basename(src))
+    ext = ext if ext is None or ext.startswith(".") else "." + ext
+    return os.path.join(out_dir, stem + suffix + (ext or src_ext))
+
+
+def _replay(img, recipe_path, source=None, head=0):
+    # a fresh Recipe per image: node outputs must not leak from one input to the next
+    recipe = Recipe.load(recipe_path)
+    ref = recipe.heads[head]
+    recipe.set_source_image(source or recipe.root(ref), img)
+    return recipe.evaluate(ref)
+
+
+def process_one(src, dst, steps, recipe=None):
+    t0 = time.perf_counter()
+    img = load_image(src)
+    if img is None:
+        raise ValueError(f"cannot read {src}")
+    mp = img.shape[0] * img.shape[1] / 1e6
+    for name, params in steps:
+        img = STEPS[name](img, **params)
+    if recipe is not None:
+        img = _replay(img, *recipe)
+    save_image(dst, img)
+    return {"src": src, "dst": dst, "megapixels": mp, "seconds": time.perf_counter() - t0}
+
+
+def run(inputs, out_dir, steps, workers=None, max_in_flight=None, suffix="", ext=None, log=print, recipe=None):
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    os.makedirs(out_dir, exist_ok=True)
+    results, errors = [], []
+    t0 = time.perf_counter()
+    todo = iter(inputs)
+    pool = get_pool(workers)  # shared with the GUI backend; started once, shut down at exit
+    pending = {}
+
+    def fill():
+        # bounded submission keeps at most max_in_flight decoded images alive
+        for src in todo:
+            pending[pool.submit(process_one, src, output_path(src, out_dir, suffix, ext), steps, recipe)] = src
+            if len(pending) >= max_in_flight:
+                return
+
+    fill()
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            src = pending.pop(fut)
+            try:
+                r = fut.result()
+            except Exception as e:
+                errors.append((src, str(e)))
+                log(f"FAIL {src}: {e}")
+                continue
+            results.append(r)
+            log(f"{len(results) + len(errors)}/{len(inputs)} {r['src']} -> {r['dst']}  "
+                f"{r['seconds'] * 1000:.0f} ms  {r['megapixels'] / r['seconds']:.1f} MP/s")
+        fill()
+    wall = time.perf_counter() - t0
+    mp = sum(r["megapixels"] for r in results)
+    summary = {
+        "images": len(results),
+        "failed": len(errors),
+        "wall_s": wall,
+        "images_per_s": len(results) / wall if wall else 0.0,
+        "megapixels_per_s": mp / wall if wall else 0.0,
+        "mean_image_s": sum(r["seconds"] for r in results) / len(results) if results else 0.0,
+    }
+    log(f"{summary['images']} images ({summary['failed']} failed) in {wall:.2f} s: "
+        f"{summary['images_per_s']:.2f} img/s, {summary['megapixels_per_s']:.1f} MP/s, "
+        f"{summary['mean_image_s'] * 1000:.0f} ms/image with {workers} workers")
+    return results, errors, summary
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(
+        prog="python -m artfusion",
+        description="Apply a chain of ArtFusion operations to many images in parallel.",
+        epilog="Steps: " + ", ".join(STEPS) + ". Example: --step adjust:contrast=1.2,gamma=1.1 "
+               "--step reinhard:ref=look.jpg --step vignette:strength=0.5",
+    )
+    ap.add_argument("inputs", nargs="+", help="input directories, files or glob patterns")
+    ap.add_argument("-o", "--out", required=True, help="output directory")
+    ap.add_argument("-s", "--step", dest="steps", action="append", type=parse_step, default=[],
+                    help="operation as name[:key=value,...]; repeat in order")
+    ap.add_argument("-r", "--recipe", default=None,
+                    help="replay a recipe saved from the GUI, with each input replacing its source image")
+    ap.add_argument("--recipe-source", default=None,
+                    help="recipe source id the inputs replace (default: root of the replayed head)")
+    ap.add_argument("--recipe-head", type=int, default=0, choices=(0, 1), help="recipe slot to output")
+    ap.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    ap.add_argument("--max-in-flight", type=int, default=None, help="images queued or processing at once (default: 2x workers)")
+    ap.add_argument("--suffix", default="", help="appended to each output file name")
+    ap.add_argument("--ext", default=None, help="output format extension (default: same as input)")
+    args = ap.parse_args(argv)
+
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        ap.error("no input images found")
+    if not args.steps and not args.recipe:
+        ap.error("at least one --step or a --recipe is required")
+    recipe = None
+    if args.recipe:
+        r = Recipe.load(args.recipe)  # fail early on a bad file
+        if r.heads[args.recipe_head] is None:
+            ap.error(f"recipe has no output for slot {args.recipe_head}")
+        recipe = (os.path.abspath(args.recipe), args.recipe_source, args.recipe_head)
+    _, errors, _ = run(inputs, args.out, args.steps, args.workers, args.max_in_flight, args.suffix, args.ext,
+                       recipe=recipe)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
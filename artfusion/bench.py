@@ -0,0 +1,417 @@
+import argparse
+import inspect
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import cv2
+from .ops import Ops
+from .utils import load_image, save_image
+
+# op name -> (extra inputs, params); inputs are "other" (a second photo of a
+# different size) or "mask" (uint8 mask of img's size). Public Ops methods
+# missing here are still benchmarked, with img as only argument.
+CASES = {
+    "adjust": ((), {"brightness": 10, "contrast": 1.2, "saturation": 1.1, "hue": 5, "gamma": 1.2}),
+    "grayscale": ((), {}),
+    "sepia": ((), {"strength": 0.8}),
+    "blur": ((), {"k": 15}),
+    "sharpen": ((), {"amount": 1.0}),
+    "edges": ((), {}),
+    "cartoon": ((), {}),
+    "cartoon_edges": ((), {}),
+    "vignette": ((), {"strength": 0.6}),
+    "glow": ((), {"amount": 0.6}),
+    "blend": (("other",), {"mode": "overlay", "alpha": 0.5}),
+    "otsu_mask": ((), {"feather": 7}),
+    "composite_by_mask": (("other", "mask"), {}),
+    "otsu_composite": (("other",), {"feather": 7}),
+    "reinhard_color_transfer": (("other",), {}),
+}
+
+# golden check tolerances: (max abs diff, mean abs diff) per op
+TOLERANCE = (2, 0.05)
+TOLERANCES = {"edges": (255, 0.5), "cartoon": (255, 0.5), "cartoon_edges": (255, 0.5)}  # Canny flips pixels
+VARIANT_MEAN_TOLERANCE = 2.0  # variant thumbnail vs the downscaled full-resolution apply, in levels
+
+
+def ops_names():
+    return [n for n, f in inspect.getmembers(Ops, callable) if not n.startswith("_")]
+
+
+def image_size(mp):
+    w = int((mp * 1e6 * 3 / 2) ** 0.5)
+    return w, int(mp * 1e6 / w)
+
+
+def synthetic(mp, seed=0):
+    """Deterministic photo-like BGR image: smooth colour fields, gradients and grain."""
+    w, h = image_size(mp)
+    rng = np.random.default_rng(seed)
+    img = cv2.resize(rng.integers(0, 256, (max(2, h // 64), max(2, w // 64), 3), dtype=np.uint8), (w, h),
+                     interpolation=cv2.INTER_CUBIC)
+    ramp = cv2.resize(np.linspace(0, 60, 256, dtype=np.float32)[None, :], (w, h)).astype(np.uint8)
+    cv2.add(img, cv2.merge([ramp, ramp, ramp]), dst=img)
+    grain = cv2.resize(rng.integers(0, 24, (min(h, 512), min(w, 512), 3), dtype=np.uint8), (w, h),
+                       interpolation=cv2.INTER_NEAREST)
+    cv2.subtract(img, grain, dst=img)
+    return img
+
+
+def inputs_for(mp, seed=0):
+    img = synthetic(mp, seed)
+    other = cv2.resize(synthetic(mp, seed + 1), None, fx=0.75, fy=0.75, interpolation=cv2.INTER_AREA)
+    other.setflags(write=False)  # slot images are read-only in the app
+    return {"img": img, "other": other, "mask": Ops.otsu_mask(img, feather=7)}
+
+
+def call(name, data):
+    extra, params = CASES.get(name, ((), {}))
+    return getattr(Ops, name)(data["img"], *(data[k] for k in extra), **params)
+
+
+# --- Measurement ---
+def measure(fn, repeat=3):
+    """Wall times over `repeat` runs, then one traced run for memory and allocations."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter(); out = fn(); times.append(time.perf_counter() - t0)
+        del out
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        out = fn()
+        cur, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    ignore = (tracemalloc.Filter(False, tracemalloc.__file__),)
+    diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+    nbytes = getattr(out, "nbytes", 0)
+    return {
+        "best_s": min(times),
+        "median_s": sorted(times)[len(times) // 2],
+        "peak_mb": (peak - base) / 1e6,       # NumPy/OpenCV buffers alive at the worst point
+        "retained_mb": (cur - base) / 1e6,    # still allocated after the call (the result)
+        "allocs": sum(max(0, d.count_diff) for d in diff),  # blocks the call left allocated, per source line
+        "temp_x": (peak - base) / nbytes if nbytes else None,  # peak in multiples of the output
+    }
+
+
+def io_cases(img, tmp):
+    cases = {}
+    for ext in ("png", "jpg"):
+        path = os.path.join(tmp, "in." + ext)
+        save_image(path, img)
+        cases[f"load_image.{ext}"] = lambda p=path: load_image(p)
+        cases[f"save_image.{ext}"] = lambda e=ext: save_image(os.path.join(tmp, "out." + e), img)
+    try:
+        from .utils import to_qimage
+        import PySide6  # noqa: F401
+        cases["to_qimage"] = lambda: to_qimage(img)
+    except ImportError:
+        pass  # Qt is optional headless
+    return cases
+
+
+def run(megapixels=(1, 8, 24, 50, 100), ops=None, repeat=3, io=True, log=print):
+    rows = []
+    names = ops or ops_names()
+    for mp in megapixels:
+        data = inputs_for(mp)
+        cases = {n: (lambda n=n: call(n, data)) for n in names if n in ops_names()}
+        with tempfile.TemporaryDirectory() as tmp:
+            if io:
+                cases.update({n: f for n, f in io_cases(data["img"], tmp).items() if not ops or n in ops})
+            for name, fn in cases.items():
+                r = {"op": name, "mp": mp, **measure(fn, repeat)}
+                r["mp_per_s"] = mp / r["best_s"] if r["best_s"] else 0.0
+                rows.append(r)
+                log(f"{name:24s} {mp:4g} MP  {r['best_s'] * 1000:9.1f} ms  {r['mp_per_s']:7.1f} MP/s  "
+                    f"peak {r['peak_mb']:8.1f} MB  allocs {r['allocs']:6d}")
+    return rows
+
+
+# --- Startup: each run in a fresh interpreter ---
+_STARTUP = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import artfusion.ops
+r = {"import_ops": time.perf_counter() - t0}
+if sys.argv[1] == "gui":
+    t1 = time.perf_counter()
+    from PySide6.QtCore import QTimer
+    from PySide6.QtWidgets import QApplication
+    from artfusion.mainwindow import ArtFusion
+    r["import_gui"] = time.perf_counter() - t1
+    app = QApplication([]); win = ArtFusion(); win.show()
+    QTimer.singleShot(0, app.quit); app.exec()  # returns after the first event loop turn with the window up
+    r["first_window"] = time.perf_counter() - t0
+print(json.dumps(r))
+'''
+
+
+def _python(code, *args):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in (root, os.environ.get("PYTHONPATH")) if p),
+               ARTFUSION_AUTOSAVE_S="0")  # a timing window must never write over the user's session
+    out = subprocess.run([sys.executable, "-c", code, *args], capture_output=True, text=True, env=env, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def startup(repeat=3, log=print):
+    """Import times and time to first window (set QT_QPA_PLATFORM=offscreen without a display)."""
+    try:
+        import PySide6  # noqa: F401
+        mode = "gui"
+    except ImportError:
+        mode = "ops"
+    runs = []
+    for _ in range(repeat):
+        try:
+            runs.append(_python(_STARTUP, mode))
+        except subprocess.CalledProcessError as e:
+            if mode == "ops":
+                raise
+            log(f"GUI startup failed, timing imports only: {e.stderr.strip().splitlines()[-1:]}")
+            mode = "ops"
+            runs.append(_python(_STARTUP, mode))
+    rows = []
+    for key in ("import_ops", "import_gui", "first_window"):
+        times = sorted(r[key] for r in runs if key in r)
+        if not times:
+            continue
+        rows.append({"op": "startup." + key, "mp": 0, "best_s": times[0], "median_s": times[len(times) // 2],
+                     "peak_mb": 0.0, "retained_mb": 0.0, "allocs": 0, "temp_x": None,
+                     "mp_per_s": 0.0})
+        log(f"{rows[-1]['op']:24s}          {times[0] * 1000:9.1f} ms")
+    return rows
+
+
+# --- Correctness checks ---
+def _diff(a, b):
+    if a.shape != b.shape:
+        return float("inf"), float("inf")
+    d = np.abs(a.astype(np.int16) - b.astype(np.int16))
+    return int(d.max()), float(d.mean())
+
+
+def check_references(data):
+    """Optimized paths against the implementations they replaced: must be identical."""
+    img, other = data["img"], data["other"]
+    out = []
+    for b in (-40, 0, 25):
+        for c in (0.8, 1.0, 1.3):
+            for s, hue, g in ((1.0, 0, 1.0), (1.4, 12, 0.8), (0.5, -30, 1.5)):
+                p = dict(brightness=b, contrast=c, saturation=s, hue=hue, gamma=g)
+                mx, mean = _diff(Ops.adjust(img, **p), Ops._adjust_reference(img, **p))
+                out.append({"check": "reference", "name": f"adjust {p}", "ok": mx == 0, "max": mx, "mean": mean})
+    for mode in ("normal", "multiply", "screen", "overlay", "darken", "lighten", "add"):
+        mx, mean = _diff(Ops.blend(img, other, mode, 0.35), Ops._blend_reference(img, other, mode, 0.35))
+        out.append({"check": "reference", "name": f"blend {mode}", "ok": mx == 0, "max": mx, "mean": mean})
+    # LUT-based Reinhard differs only where its float64 statistics round a LAB value the
+    # other way; near the gamut edge one LAB step can move BGR a lot, so only the mean is bounded
+    mx, mean = _diff(Ops.reinhard_color_transfer(img, other), Ops._reinhard_reference(img, other))
+    out.append({"check": "reference", "name": "reinhard_color_transfer", "ok": mean <= 0.05,
+                "max": mx, "mean": mean})
+    # integer compositing is exact floor((base*(255-m) + other*m) / 255); float32 rounding in
+    # the old code sometimes lands one below it
+    mask = Ops.otsu_mask(img, feather=7)
+    mx, mean = _diff(Ops.composite_by_mask(img, other, mask), Ops._composite_by_mask_reference(img, other, mask))
+    out.append({"check": "reference", "name": "composite_by_mask", "ok": mx <= 1, "max": mx, "mean": mean})
+    return out
+
+
+def check_tiling(data, tile=256, workers=4):
+    """Tiled execution must match untiled output exactly."""
+    from .tiles import HALOS, TiledExecutor
+    ex = TiledExecutor(tile=tile, workers=workers)
+    out = []
+    try:
+        for name in HALOS:
+            extra, params = CASES.get(name, ((), {}))
+            args = [data[k] for k in extra]
+            mx, mean = _diff(ex.apply(name, data["img"], *args, **params), call(name, data))
+            out.append({"check": "tiling", "name": name, "ok": mx == 0, "max": mx, "mean": mean})
+    finally:
+        ex.close()
+    return out
+
+
+def check_process(data, workers=2):
+    """Process-pool bands must match the in-process call exactly."""
+    from .procpool import ProcessExecutor
+    ex = ProcessExecutor(workers=workers, min_pixels=0)
+    out = []
+    try:
+        for name in ("blur", "cartoon", "blend", "composite_by_mask", "reinhard_color_transfer"):
+            extra, params = CASES.get(name, ((), {}))
+            mx, mean = _diff(ex.apply(name, data["img"], *[data[k] for k in extra], **params), call(name, data))
+            out.append({"check": "process", "name": name, "ok": mx == 0, "max": mx, "mean": mean})
+    finally:
+        ex.close()
+    return out
+
+
+def check_variants(data):
+    """Batched variant thumbnails must match calling each op on the thumbnail, and the full-res apply."""
+    from . import variants
+    small = variants.thumbnail(data["img"])
+    other = variants.thumbnail(data["other"], shape=small.shape[:2])
+    out = []
+    for family in variants.FAMILIES:
+        mx = 0; mean = 0.0
+        for _label, op, params, res in variants.render(small, family, other):
+            d = _diff(res, getattr(Ops, op)(small, *((other,) if op == "blend" else ()), **params))
+            mx = max(mx, d[0]); mean = max(mean, d[1])
+        out.append({"check": "variants", "name": family, "ok": mx == 0, "max": mx, "mean": mean})
+    # and stay close to what Apply gives once shown at thumbnail size (clipping and
+    # resampling do not commute exactly, so only the mean difference is bounded)
+    img = data["img"]
+    for family in variants.FAMILIES:
+        mx = 0; mean = 0.0
+        for _label, op, params, res in variants.render(img, family, data["other"]):
+            full = getattr(Ops, op)(img, *((data["other"],) if op == "blend" else ()), **params)
+            d = _diff(res, variants.thumbnail(full, shape=res.shape[:2]))
+            mx = max(mx, d[0]); mean = max(mean, d[1])
+        out.append({"check": "variants.full", "name": family, "ok": mean <= VARIANT_MEAN_TOLERANCE,
+                    "max": mx, "mean": mean})
+    return out
+
+
+def check_pipeline(data):
+    """Float working buffers: one op within rounding of Ops, a chain within one level of float64, exact sRGB round-trip."""
+    from . import pipeline
+    img, other = data["img"], data["other"]
+    out = []
+    for op, extra, params in [("vignette", (), {"strength": 0.6}), ("glow", (), {"amount": 0.5}),
+                              ("sepia", (), {"strength": 0.8}), ("blend", (other,), {"mode": "soft light"})]:
+        d = _diff(pipeline.run(img, [(op, extra, params)]), getattr(Ops, op)(img, *extra, **params))
+        out.append({"check": "pipeline", "name": op, "ok": d[0] <= 1, "max": d[0], "mean": d[1]})
+    steps = [("glow", (), {"amount": 0.5}), ("vignette", (), {"strength": 0.6}),
+             ("sepia", (), {"strength": 0.4}), ("blend", (other,), {"mode": "normal", "alpha": 0.3})]
+    for dtype in pipeline.DTYPES:
+        for linear in (False, True):
+            err = np.abs(pipeline.run(img, steps, dtype, linear) - pipeline._reference(img, steps, linear))
+            out.append({"check": "pipeline", "name": f"chain {dtype}{' linear' if linear else ''}",
+                        "ok": bool(err.max() <= 1), "max": float(err.max()), "mean": float(err.mean())})
+    d = _diff(pipeline.run(img, [], linear=True), img)
+    out.append({"check": "pipeline", "name": "linear round-trip", "ok": d[0] == 0, "max": d[0], "mean": d[1]})
+    d = _diff(Ops.blend(img, other, linear=True), pipeline.run(img, [("blend", (other,), {})], linear=True))
+    out.append({"check": "pipeline", "name": "linear blend", "ok": d[0] <= 1, "max": d[0], "mean": d[1]})
+    return out
+
+
+def check_imports():
+    """The compute core and batch CLI must import without Qt."""
+    code = "import json, sys, artfusion.ops, artfusion.batch; print(json.dumps('PySide6' in sys.modules))"
+    qt = _python(code)
+    return [{"check": "imports", "name": "artfusion.ops/batch without Qt", "ok": not qt, "max": int(qt), "mean": 0.0}]
+
+
+def check_golden(golden_dir, data, update=False):
+    """Compare each op's output with images stored in golden_dir (written on first run or update)."""
+    os.makedirs(golden_dir, exist_ok=True)
+    out = []
+    for name in ops_names():
+        res = call(name, data)
+        path = os.path.join(golden_dir, name + ".png")
+        if update or not os.path.exists(path):
+            cv2.imwrite(path, res)  # keeps single-channel outputs as they are
+            out.append({"check": "golden", "name": name, "ok": True, "max": 0, "mean": 0.0, "written": True})
+            continue
+        ref = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        mx, mean = _diff(res, ref)
+        tmax, tmean = TOLERANCES.get(name, TOLERANCE)
+        out.append({"check": "golden", "name": name, "ok": mx <= tmax and mean <= tmean, "max": mx, "mean": mean})
+    return out
+
+
+# --- Baseline comparison ---
+def compare(rows, baseline, slower=1.25, log=print):
+    """Ratios of best times against a previous run; returns the regressions."""
+    base = {(r["op"], r["mp"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in rows:
+        b = base.get((r["op"], r["mp"]))
+        if b is None or not b["best_s"]:
+            continue
+        ratio = r["best_s"] / b["best_s"]
+        flag = ""
+        if ratio > slower:
+            regressions.append({"op": r["op"], "mp": r["mp"], "ratio": ratio})
+            flag = "  SLOWER"
+        elif ratio < 1 / slower:
+            flag = "  faster"
+        log(f"{r['op']:24s} {r['mp']:4g} MP  {b['best_s'] * 1000:9.1f} -> {r['best_s'] * 1000:9.1f} ms  "
+            f"x{ratio:5.2f}  peak {b['peak_mb']:7.1f} -> {r['peak_mb']:7.1f} MB{flag}")
+    return regressions
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "opencv_threads": cv2.getNumThreads(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m artfusion.bench",
+                                 description="Time every Ops function and image I/O, and check optimized paths.")
+    ap.add_argument("--mp", type=float, nargs="+", default=[1, 8, 24, 50, 100], help="image sizes in megapixels")
+    ap.add_argument("--ops", nargs="+", default=None, help="only these ops (e.g. blur load_image.png)")
+    ap.add_argument("--repeat", type=int, default=3, help="timed runs per case (best is kept)")
+    ap.add_argument("--no-io", action="store_true", help="skip load/save/to_qimage")
+    ap.add_argument("--no-startup", action="store_true", help="skip import and time-to-first-window timings")
+    ap.add_argument("-o", "--out", default=None, help="write results as JSON")
+    ap.add_argument("-b", "--baseline", default=None, help="JSON from an earlier run to compare against")
+    ap.add_argument("--slower", type=float, default=1.25, help="time ratio counted as a regression")
+    ap.add_argument("--golden", default=None, help="directory of golden outputs (created on first run)")
+    ap.add_argument("--update-golden", action="store_true", help="rewrite the golden outputs")
+    ap.add_argument("--check-mp", type=float, default=0.5, help="image size for the correctness checks")
+    ap.add_argument("--no-checks", action="store_true", help="timings only")
+    ap.add_argument("--checks-only", action="store_true", help="correctness checks only")
+    args = ap.parse_args(argv)
+
+    report = {"environment": environment(), "results": [], "checks": []}
+    if not args.no_checks:
+        data = inputs_for(args.check_mp, seed=42)
+        checks = check_references(data) + check_tiling(data) + check_process(data) + check_variants(data) + check_pipeline(data) + check_imports()
+        if args.golden:
+            checks += check_golden(args.golden, data, args.update_golden)
+        report["checks"] = checks
+        failed = [c for c in checks if not c["ok"]]
+        for c in failed:
+            print(f"FAIL {c['check']} {c['name']}: max diff {c['max']}, mean {c['mean']:.4f}")
+        print(f"{len(checks) - len(failed)}/{len(checks)} checks passed")
+    if not args.checks_only:
+        if not args.ops or any(not o.startswith("startup") for o in args.ops):
+            report["results"] = run(args.mp, args.ops, args.repeat, io=not args.no_io)
+        if not args.no_startup and (not args.ops or any(o.startswith("startup") for o in args.ops)):
+            report["results"] += startup(args.repeat)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report["results"], json.load(f), args.slower)
+        report["regressions"] = regressions
+        print(f"{len(regressions)} regression(s) beyond x{args.slower}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if regressions or any(not c["ok"] for c in report["checks"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
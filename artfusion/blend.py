@@ -0,0 +1,192 @@
+import threading
+import numpy as np
+import cv2
+from .utils import IdentityMemo
+
+MODES = (
+    "normal", "multiply", "screen", "overlay", "darken", "lighten", "add",
+    "soft light", "color dodge", "color burn", "difference",
+)
+
+STRIP_ELEMS = 1 << 20  # float32 elements per strip buffer (4 MB)
+
+
+# --- Kernels: in-place on float32 strips in [0, 1]; the result ends up in `a`.
+# `b`, `t`, `u` and the bool mask `m` are scratch. Operation order mirrors the
+# original float code so results stay bit-identical for the seven base modes.
+def _normal(a, b, alpha, t, u, m):
+    np.multiply(a, 1 - alpha, out=a); np.multiply(b, alpha, out=b); np.add(a, b, out=a)
+
+
+def _multiply(a, b, alpha, t, u, m):
+    np.multiply(a, b, out=a)
+
+
+def _screen(a, b, alpha, t, u, m):
+    np.subtract(1, a, out=a); np.subtract(1, b, out=b)
+    np.multiply(a, b, out=a); np.subtract(1, a, out=a)
+
+
+def _overlay(a, b, alpha, t, u, m):
+    np.less_equal(a, 0.5, out=m)
+    np.multiply(a, 2, out=t); np.multiply(t, b, out=t)  # 2ab
+    np.subtract(1, a, out=a); np.multiply(a, 2, out=a)
+    np.subtract(1, b, out=b); np.multiply(a, b, out=a); np.subtract(1, a, out=a)  # 1 - 2(1-a)(1-b)
+    np.copyto(a, t, where=m)
+
+
+def _darken(a, b, alpha, t, u, m):
+    np.minimum(a, b, out=a)
+
+
+def _lighten(a, b, alpha, t, u, m):
+    np.maximum(a, b, out=a)
+
+
+def _add(a, b, alpha, t, u, m):
+    np.multiply(b, alpha, out=b); np.add(a, b, out=a); np.clip(a, 0, 1, out=a)
+
+
+def _soft_light(a, b, alpha, t, u, m):
+    # W3C soft light with a as backdrop
+    np.sqrt(a, out=t)
+    np.multiply(a, 16, out=u); u -= 12; u *= a; u += 4; u *= a
+    np.less_equal(a, 0.25, out=m); np.copyto(t, u, where=m)  # t = D(a)
+    t -= a
+    np.multiply(b, 2, out=u); u -= 1  # u = 2b - 1
+    t *= u; t += a  # b > 0.5: a + (2b - 1)(D(a) - a)
+    np.greater(u, 0, out=m)
+    np.subtract(1, a, out=b); b *= a; b *= u; a += b  # b <= 0.5: a - (1 - 2b) a (1 - a)
+    np.copyto(a, t, where=m)
+
+
+def _color_dodge(a, b, alpha, t, u, m):
+    np.subtract(1, b, out=t)
+    u.fill(1)
+    np.divide(a, t, out=u, where=t > 0)
+    np.minimum(u, 1, out=u)
+    np.equal(a, 0, out=m)
+    np.copyto(u, 0, where=m)
+    np.copyto(a, u)
+
+
+def _color_burn(a, b, alpha, t, u, m):
+    np.subtract(1, a, out=t)
+    u.fill(1)
+    np.divide(t, b, out=u, where=b > 0)
+    np.minimum(u, 1, out=u)
+    np.equal(t, 0, out=m)
+    np.subtract(1, u, out=a)
+    np.copyto(a, 1, where=m)
+
+
+def _difference(a, b, alpha, t, u, m):
+    np.subtract(a, b, out=a); np.abs(a, out=a)
+
+
+KERNELS = {
+    "normal": _normal, "multiply": _multiply, "screen": _screen, "overlay": _overlay,
+    "darken": _darken, "lighten": _lighten, "add": _add, "soft light": _soft_light,
+    "color dodge": _color_dodge, "color burn": _color_burn, "difference": _difference,
+}
+
+
+class BlendScratch:
+    """Strip-sized float32 work buffers; keep one around to make blends allocation-free."""
+
+    def __init__(self):
+        self._bufs = None
+
+    def views(self, shape):
+        n = int(np.prod(shape))
+        if self._bufs is None or self._bufs[0].size < n:
+            self._bufs = [np.empty(n, np.float32) for _ in range(4)] + [np.empty(n, bool)]
+        return [buf[:n].reshape(shape) for buf in self._bufs]
+
+
+_local = threading.local()
+
+
+def _thread_scratch():
+    s = getattr(_local, "scratch", None)
+    if s is None:
+        s = _local.scratch = BlendScratch()
+    return s
+
+
+# --- Linear light: the sRGB transfer curve as lookup tables ---
+def srgb_decode(x):
+    return np.where(x <= 0.04045, x / 12.92, ((x + 0.055) / 1.055) ** 2.4)
+
+
+def srgb_encode(x):
+    return np.where(x <= 0.0031308, x * 12.92, 1.055 * np.maximum(x, 0.0031308) ** (1 / 2.4) - 0.055)
+
+
+LINEAR_STEPS = 1 << 16  # linear values are quantized to 16 bits before encoding: well under one sRGB level
+TO_LINEAR = srgb_decode(np.arange(256) / 255.0).astype(np.float32)  # uint8 sRGB -> linear [0, 1]
+FROM_LINEAR = np.rint(srgb_encode(np.linspace(0, 1, LINEAR_STEPS)) * 255).astype(np.uint8)
+
+
+def to_linear(img, out=None):
+    """uint8 sRGB -> linear float32 [0, 1]."""
+    return cv2.LUT(img, TO_LINEAR.reshape(1, 256), dst=out)
+
+
+def from_linear(x, out):
+    """Linear float32 [0, 1] (clipped in place) -> uint8 sRGB written into out."""
+    np.clip(x, 0, 1, out=x); x *= LINEAR_STEPS - 1; x += 0.5
+    np.take(FROM_LINEAR, x.astype(np.uint16), out=out)
+
+
+# Resized copies of frozen `other` images, per target size
+_resized = IdentityMemo()
+
+
+def resized(img, w, h):
+    if img.shape[1] == w and img.shape[0] == h:
+        return img
+
+    def compute():
+        out = cv2.resize(img, (w, h), interpolation=cv2.INTER_LINEAR)
+        out.setflags(write=False)
+        return out
+
+    return _resized.get(img, (w, h), compute)
+
+
+def blend(a, b, mode="normal", alpha=0.5, out=None, scratch=None, linear=False):
+    """Blend b over a (uint8) strip by strip; writes into `out` when given.
+
+    linear=True blends in linear light: both images are decoded from sRGB
+    (a table lookup), blended, and encoded back.
+    """
+    if b is None:
+        if out is None:
+            return a
+        np.copyto(out, a)
+        return out
+    h, w = a.shape[:2]
+    b = resized(b, w, h)
+    if out is None:
+        out = np.empty_like(a)
+    kernel = KERNELS.get(mode, _normal)
+    scratch = scratch or _thread_scratch()
+    a3, b3, o3 = (x.reshape(h, w, -1) for x in (a, b, out))
+    c = a3.shape[2]
+    rows = max(1, STRIP_ELEMS // (w * c))
+    k255 = np.float32(255.0)
+    for y in range(0, h, rows):
+        y1 = min(h, y + rows)
+        fa, fb, t, u, m = scratch.views((y1 - y, w, c))
+        if linear:
+            to_linear(a3[y:y1], fa); to_linear(b3[y:y1], fb)
+            kernel(fa, fb, alpha, t, u, m)
+            from_linear(fa, o3[y:y1])
+            continue
+        np.divide(a3[y:y1], k255, out=fa, dtype=np.float32)
+        np.divide(b3[y:y1], k255, out=fb, dtype=np.float32)
+        kernel(fa, fb, alpha, t, u, m)
+        np.multiply(fa, 255, out=fa)
+        np.copyto(o3[y:y1], fa, casting="unsafe")  # truncates like astype(np.uint8)
+    return out
\ No newline at end of file
@@ -0,0 +1,214 @@
+import functools
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from .ops import Ops
+from .utils import IdentityMemo
+
+_fp_memo = IdentityMemo(per_array=1)
+
+
+def fingerprint(img):
+    """Content hash of an array (shape, dtype and bytes).
+
+    Frozen arrays (see utils.frozen) cannot change, so their digest is
+    remembered for as long as the array lives.
+    """
+    def compute():
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{img.shape}{img.dtype.str}".encode())
+        h.update(np.ascontiguousarray(img).data)
+        return h.hexdigest()
+
+    return _fp_memo.get(img, None, compute)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass  # gone already
+
+
+def _freeze(a):
+    a.setflags(write=False)
+    return a
+
+
+class ResultCache:
+    """Memoizes image-returning calls, keyed on op name, params and input contents.
+
+    Entries are kept in memory under an LRU byte budget; evicted entries are
+    written to `spill_dir` (if given) and reloaded from there on a later hit.
+    Spill files are an LRU of their own under disk_budget_bytes, counting the
+    files a previous session left there. Returned arrays are read-only since
+    they are shared between callers.
+    """
+
+    def __init__(self, budget_bytes=256 * 1024 * 1024, spill_dir=None, disk_budget_bytes=1024 * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self.disk_budget_bytes = disk_budget_bytes
+        self.spill_dir = spill_dir
+        self._mem = OrderedDict()
+        self._nbytes = 0
+        self._disk = OrderedDict()  # spilled key -> file size, least recently used first
+        self._disk_nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.spills = self.disk_hits = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            files = []
+            for entry in os.scandir(spill_dir):
+                key, ext = os.path.splitext(entry.name)
+                tmp = key.endswith(".tmp")
+                key = key[:-4] if tmp else key
+                if len(key) != 32 or ext != ".npy" or key.strip("0123456789abcdef"):
+                    continue  # not a spill file: never ours to delete
+                if tmp:
+                    _remove(entry.path)  # an interrupted spill
+                    continue
+                st = entry.stat()
+                files.append((st.st_mtime, key, st.st_size))
+            for _, key, size in sorted(files):
+                self._disk[key] = size
+                self._disk_nbytes += size
+            self._trim_disk()
+
+    @staticmethod
+    def key(name, args, kwargs):
+        def part(a):
+            return "#" + fingerprint(a) if isinstance(a, np.ndarray) else repr(a)
+
+        parts = [name] + [part(a) for a in args] + [f"{k}={part(v)}" for k, v in sorted(kwargs.items())]
+        return hashlib.blake2b("\x00".join(parts).encode(), digest_size=16).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            out = self._mem.get(key)
+            if out is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return out
+        path = self._spill_path(key)
+        if path and os.path.exists(path):
+            try:
+                out = _freeze(np.load(path))
+            except (OSError, ValueError):
+                out = None
+            if out is not None:
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                self._put(key, out)
+                return out
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        return self._put(key, _freeze(value))
+
+    def _put(self, key, value):
+        spill = []
+        with self._lock:
+            if key in self._mem:
+                self._nbytes -= self._mem.pop(key).nbytes
+            self._mem[key] = value
+            self._nbytes += value.nbytes
+            while self._nbytes > self.budget_bytes and len(self._mem) > 1:
+                k, v = self._mem.popitem(last=False)
+                self._nbytes -= v.nbytes
+                self.evictions += 1
+                spill.append((k, v))
+        for k, v in spill:
+            path = self._spill_path(k)
+            if path and not os.path.exists(path) and v.nbytes <= self.disk_budget_bytes:
+                tmp = path + ".tmp.npy"
+                np.save(tmp, v)
+                os.replace(tmp, path)
+                size = os.path.getsize(path)
+                with self._lock:
+                    self.spills += 1
+                    self._disk_nbytes += size - self._disk.pop(k, 0)
+                    self._disk[k] = size
+        if spill and self.spill_dir:
+            self._trim_disk()
+        return value
+
+    def _trim_disk(self):
+        # oldest spill files go first, like evictions from memory
+        drop = []
+        with self._lock:
+            while self._disk_nbytes > self.disk_budget_bytes and self._disk:
+                k, size = self._disk.popitem(last=False)
+                self._disk_nbytes -= size
+                drop.append(k)
+        for k in drop:
+            _remove(self._spill_path(k))
+
+    def _spill_path(self, key):
+        return os.path.join(self.spill_dir, key + ".npy") if self.spill_dir else None
+
+    def wrap(self, fn, name=None):
+        """Cached version of fn with the same signature; non-array results pass through."""
+        name = name or getattr(fn, "__qualname__", repr(fn))
+
+        @functools.wraps(fn)
+        def cached(*args, **kwargs):
+            k = self.key(name, args, kwargs)
+            out = self.get(k)
+            if out is None:
+                out = fn(*args, **kwargs)
+                if isinstance(out, np.ndarray):
+                    inputs = [a for a in list(args) + list(kwargs.values()) if isinstance(a, np.ndarray)]
+                    if any(np.may_share_memory(out, a) for a in inputs):
+                        out = out.copy()  # never freeze a caller's buffer (e.g. blend(a, None) returns a)
+                    out = self.put(k, out)
+            return out
+
+        return cached
+
+    def clear(self):
+        """Forget every entry, in memory and spilled."""
+        with self._lock:
+            self._mem.clear()
+            self._nbytes = 0
+            drop, self._disk, self._disk_nbytes = list(self._disk), OrderedDict(), 0
+        for k in drop:
+            _remove(self._spill_path(k))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "spills": self.spills,
+                "disk_hits": self.disk_hits,
+                "entries": len(self._mem),
+                "nbytes": self._nbytes,
+                "budget_bytes": self.budget_bytes,
+                "disk_entries": len(self._disk),
+                "disk_nbytes": self._disk_nbytes,
+                "disk_budget_bytes": self.disk_budget_bytes,
+            }
+
+
+class CachedOps:
+    """Ops with every static method memoized in `cache`: CachedOps(cache).cartoon(img, ...)."""
+
+    def __init__(self, cache, ops=Ops):
+        self.cache = cache
+        self._ops = ops
+
+    def __getattr__(self, name):
+        fn = getattr(self._ops, name)
+        if name.startswith("_") or not callable(fn):
+            return fn
+        wrapped = self.cache.wrap(fn, "Ops." + name)
+        setattr(self, name, wrapped)
+        return wrapped
\ No newline at end of file
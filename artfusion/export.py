@@ -0,0 +1,152 @@
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from .utils import save_image
+from .instrument import span
+
+# libtiff compression codes (named cv2 constants only exist in recent OpenCV)
+TIFF_COMPRESSION = {"none": 1, "lzw": 5, "jpeg": 7, "deflate": 8, "packbits": 32773}
+
+# extension -> encoder options and their defaults
+FORMATS = {
+    ".png": {"compression": 3},
+    ".jpg": {"quality": 95, "progressive": False, "optimize": False},
+    ".webp": {"quality": 90, "lossless": False},
+    ".tif": {"compression": "lzw"},
+    ".bmp": {},
+}
+ALIASES = {".jpeg": ".jpg", ".tiff": ".tif"}
+
+
+def encoder_params(ext, **options):
+    """cv2.imwrite params for ext; options override FORMATS[ext] defaults."""
+    ext = ALIASES.get(ext.lower(), ext.lower())
+    if ext not in FORMATS:
+        raise ValueError(f"unsupported format '{ext}' (choose from {', '.join(FORMATS)})")
+    unknown = set(options) - set(FORMATS[ext])
+    if unknown:
+        raise ValueError(f"unknown option(s) for {ext}: {', '.join(sorted(unknown))}")
+    o = {**FORMATS[ext], **options}
+    if ext == ".png":
+        return [cv2.IMWRITE_PNG_COMPRESSION, min(9, max(0, int(o["compression"])))]
+    if ext == ".jpg":
+        return [cv2.IMWRITE_JPEG_QUALITY, min(100, max(1, int(o["quality"]))),
+                cv2.IMWRITE_JPEG_PROGRESSIVE, int(bool(o["progressive"])),
+                cv2.IMWRITE_JPEG_OPTIMIZE, int(bool(o["optimize"]))]
+    if ext == ".webp":
+        # quality above 100 selects lossless WebP
+        return [cv2.IMWRITE_WEBP_QUALITY, 101 if o["lossless"] else min(100, max(1, int(o["quality"])))]
+    if ext == ".tif":
+        c = o["compression"]
+        if isinstance(c, str) and c not in TIFF_COMPRESSION:
+            raise ValueError(f"unknown TIFF compression '{c}' (choose from {', '.join(TIFF_COMPRESSION)})")
+        return [cv2.IMWRITE_TIFF_COMPRESSION, TIFF_COMPRESSION.get(c, c)]
+    return []
+
+
+class ExportJob:
+    __slots__ = ("id", "path", "params", "status", "error", "megapixels", "nbytes",
+                 "submitted", "started", "finished", "future")
+
+    def __init__(self, id, path, params, megapixels):
+        self.id, self.path, self.params, self.megapixels = id, path, params, megapixels
+        self.status, self.error, self.nbytes = "queued", None, 0
+        self.submitted, self.started, self.finished = time.perf_counter(), None, None
+        self.future = None
+
+    @property
+    def wait_s(self):
+        return (self.started or time.perf_counter()) - self.submitted
+
+    @property
+    def encode_s(self):
+        return (self.finished - self.started) if self.finished and self.started else 0.0
+
+    @property
+    def latency_s(self):
+        return (self.finished or time.perf_counter()) - self.submitted
+
+    def to_dict(self):
+        enc = self.encode_s
+        return {
+            "id": self.id, "path": self.path, "status": self.status, "error": self.error,
+            "megapixels": self.megapixels, "bytes": self.nbytes,
+            "wait_s": self.wait_s, "encode_s": enc, "latency_s": self.latency_s,
+            "mb_per_s": self.nbytes / 1e6 / enc if enc else 0.0,
+            "megapixels_per_s": self.megapixels / enc if enc else 0.0,
+        }
+
+
+class ExportQueue:
+    """Encodes and writes images on a thread pool; each write is atomic (temp file + rename).
+
+    on_done(job) is called from the worker thread when a job finishes or fails;
+    the GUI forwards it through a Qt signal. Writable arrays are copied on
+    submit so later edits cannot leak into a queued export; read-only ones
+    are shared.
+    """
+
+    def __init__(self, workers=2, on_done=None):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export")
+        self.on_done = on_done
+        self.jobs = []
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def submit(self, img, path, **options):
+        params = encoder_params(os.path.splitext(path)[1] or ".png", **options)  # fail before queuing
+        if img.flags.writeable:
+            img = img.copy()
+        job = ExportJob(next(self._ids), path, params, img.shape[0] * img.shape[1] / 1e6)
+        with self._lock:
+            self.jobs.append(job)
+        job.future = self.pool.submit(self._run, job, img)
+        return job
+
+    def submit_many(self, items, **options):
+        """[(img, path), ...] with shared options -> jobs, encoded concurrently."""
+        return [self.submit(img, path, **options) for img, path in items]
+
+    def _run(self, job, img):
+        job.started = time.perf_counter()
+        job.status = "running"
+        try:
+            with span("export", "io", path=job.path):
+                save_image(job.path, img, job.params)
+            job.nbytes = os.path.getsize(job.path)
+            job.status = "done"
+        except Exception as e:
+            job.status, job.error = "failed", str(e)
+        job.finished = time.perf_counter()
+        if self.on_done is not None:
+            self.on_done(job)
+        return job
+
+    def pending(self):
+        with self._lock:
+            return [j for j in self.jobs if j.status in ("queued", "running")]
+
+    def wait(self, timeout=None):
+        for job in self.pending():
+            job.future.exception(timeout=timeout)
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self.jobs)
+        done = [j for j in jobs if j.status == "done"]
+        encode = sum(j.encode_s for j in done)
+        return {
+            "jobs": len(jobs),
+            "done": len(done),
+            "failed": sum(j.status == "failed" for j in jobs),
+            "pending": sum(j.status in ("queued", "running") for j in jobs),
+            "bytes": sum(j.nbytes for j in done),
+            "mean_latency_s": sum(j.latency_s for j in done) / len(done) if done else 0.0,
+            "mb_per_s": sum(j.nbytes for j in done) / 1e6 / encode if encode else 0.0,
+        }
+
+    def shutdown(self, wait=True):
+        self.pool.shutdown(wait=wait)
\ No newline at end of file
@@ -0,0 +1,174 @@
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .instrument import span
+
+
+class _Entry:
+    # A state stored as the tiles that differ from the state it is restored from
+    # (or as one tile covering the whole image when the shape changed). Tiles are
+    # kept raw until the background compressor swaps them for zlib payloads.
+    __slots__ = ("shape", "dtype", "full", "tiles", "nbytes", "seq", "meta")
+
+    def __init__(self, shape, dtype, full, tiles, seq, meta=None):
+        self.shape, self.dtype, self.full, self.tiles, self.seq = shape, dtype, full, tiles, seq
+        self.nbytes = _tiles_nbytes(tiles)
+        self.meta = meta
+
+
+def _tiles_nbytes(tiles):
+    return sum(p.nbytes if isinstance(p, np.ndarray) else len(p) for _, _, _, p in tiles)
+
+
+class History:
+    """Per-slot undo/redo stacks bounded by a byte budget.
+
+    Every entry is restored bit-exactly, together with an optional `meta`
+    value describing that state. When the budget is exceeded the oldest undo
+    entries are evicted first, then the farthest redo entries.
+    """
+
+    def __init__(self, budget_bytes=512 * 1024 * 1024, tile=256, level=1, slots=2):
+        self.budget_bytes = budget_bytes
+        self.tile = tile
+        self.level = level
+        self.undo_stack = [deque() for _ in range(slots)]
+        self.redo_stack = [deque() for _ in range(slots)]
+        self.evicted = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._compressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history")
+
+    # --- public API ---
+    def push(self, slot, before, after, meta=None):
+        """Record an edit of `slot` from `before` (described by meta) to `after`; clears its redo stack."""
+        if before is None:
+            return
+        with span("history.push", "history"):
+            entry = self._encode(before, after, meta)
+        with self._lock:
+            self.redo_stack[slot].clear()
+            self.undo_stack[slot].append(entry)
+        self._submit(entry)
+
+    def undo(self, slot, current, meta=None):
+        """(image, meta) of the previous state, or None; meta describes `current`."""
+        return self._step(self.undo_stack[slot], self.redo_stack[slot], current, meta)
+
+    def redo(self, slot, current, meta=None):
+        return self._step(self.redo_stack[slot], self.undo_stack[slot], current, meta)
+
+    def can_undo(self, slot):
+        return bool(self.undo_stack[slot])
+
+    def can_redo(self, slot):
+        return bool(self.redo_stack[slot])
+
+    def clear(self, slot):
+        with self._lock:
+            self.undo_stack[slot].clear()
+            self.redo_stack[slot].clear()
+
+    def metas(self):
+        """meta of every entry still held, undo and redo."""
+        with self._lock:
+            return [e.meta for e in self._entries()]
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return sum(e.nbytes for e in self._entries())
+
+    def __len__(self):
+        return sum(len(s) for s in self.undo_stack) + sum(len(s) for s in self.redo_stack)
+
+    def shutdown(self):
+        self._compressor.shutdown(wait=False, cancel_futures=True)
+
+    # --- persistence (see project.py) ---
+    def snapshot(self):
+        """Per-slot (undo, redo) entry lists, oldest / farthest first; entries are shared, not copied."""
+        with self._lock:
+            return [(list(u), list(r)) for u, r in zip(self.undo_stack, self.redo_stack)]
+
+    def restore(self, stacks):
+        """Replace every stack with the entries of a snapshot()."""
+        with self._lock:
+            for slot, (undo, redo) in enumerate(stacks):
+                self.undo_stack[slot] = deque(undo)
+                self.redo_stack[slot] = deque(redo)
+            self._seq = max((e.seq for e in self._entries()), default=0)
+        self._evict()
+
+    # --- internals ---
+    def _step(self, src, dst, current, meta):
+        with self._lock:
+            if not src:
+                return None
+            entry = src.pop()
+        img = self._decode(entry, current)
+        back = self._encode(current, img, meta)
+        with self._lock:
+            dst.append(back)
+        self._submit(back)
+        return img, entry.meta
+
+    def _encode(self, img, ref, meta=None):
+        self._seq += 1
+        if ref is None or ref.shape != img.shape or ref.dtype != img.dtype:
+            return _Entry(img.shape, img.dtype, True, [(0, 0, img.shape, np.array(img, copy=True))], self._seq, meta)
+        t = self.tile
+        h, w = img.shape[:2]
+        tiles = []
+        for y in range(0, h, t):
+            for x in range(0, w, t):
+                a = img[y:y + t, x:x + t]
+                if not np.array_equal(a, ref[y:y + t, x:x + t]):
+                    tiles.append((y, x, a.shape, np.array(a, copy=True)))
+        return _Entry(img.shape, img.dtype, False, tiles, self._seq, meta)
+
+    @staticmethod
+    def _decode(entry, ref):
+        tiles = entry.tiles  # read once: the compressor may swap the list concurrently
+        out = np.empty(entry.shape, entry.dtype) if entry.full else ref.copy()
+        for y, x, shape, payload in tiles:
+            if not isinstance(payload, np.ndarray):  # zlib bytes, or a view into a project file
+                payload = np.frombuffer(zlib.decompress(payload), entry.dtype).reshape(shape)
+            out[y:y + shape[0], x:x + shape[1]] = payload
+        return out
+
+    def _submit(self, entry):
+        try:
+            self._compressor.submit(self._compress, entry)
+        except RuntimeError:  # shut down
+            pass
+
+    def _compress(self, entry):
+        # eviction waits for compression so a fresh raw entry is not dropped needlessly
+        with span("history.compress", "history"):
+            tiles = [(y, x, shape, zlib.compress(p.tobytes(), self.level)) for y, x, shape, p in entry.tiles]
+        with self._lock:
+            entry.tiles = tiles
+            entry.nbytes = _tiles_nbytes(tiles)
+        self._evict()
+
+    def _entries(self):
+        for s in self.undo_stack:
+            yield from s
+        for s in self.redo_stack:
+            yield from s
+
+    def _evict(self):
+        with self._lock:
+            total = sum(e.nbytes for e in self._entries())
+            while total > self.budget_bytes:
+                undo = [s for s in self.undo_stack if s]
+                stacks = undo or [s for s in self.redo_stack if s]
+                if not stacks:
+                    break
+                # deques hold oldest (undo) / farthest (redo) entries on the left
+                victim = min(stacks, key=lambda s: s[0].seq if undo else -s[0].seq)
+                total -= victim.popleft().nbytes
+                self.evicted += 1
\ No newline at end of file
@@ -1,29 +1,212 @@
+from collections import OrderedDict
+import cv2
 from PySide6 import QtGui
-from PySide6.QtCore import Qt
-from PySide6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsPixmapItem
+from PySide6.QtCore import QPointF, QRectF, Qt
+from PySide6.QtWidgets import QGraphicsItem, QGraphicsView, QGraphicsScene, QStyleOptionGraphicsItem
 from .utils import qpixmap_from_bgr
+from .instrument import count, span
+
+TILE = 512
+TILE_BUDGET_BYTES = 192 * 1024 * 1024  # tile pixmaps kept per view
+
+
+class TiledImageItem(QGraphicsItem):
+    """Paints an image from fixed-size pixmap tiles at the level of detail on screen.
+
+    Level i is the image downscaled by 2**i; paint() uses the coarsest level
+    that still has a pixel per device pixel and uploads only the tiles the
+    exposed region touches. Tiles are kept in an LRU capped at budget_bytes,
+    so pixmap memory follows the viewport, not the image.
+    """
+
+    def __init__(self, tile=TILE, budget_bytes=TILE_BUDGET_BYTES):
+        super().__init__()
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)  # exposedRect: only the dirty region
+        self.tile, self.budget_bytes = tile, budget_bytes
+        self._levels = {}
+        self._rect = QRectF()
+        self._tiles = OrderedDict()  # (level, tx, ty) -> QPixmap
+        self.nbytes = 0
+
+    def set_image(self, img, size=None):
+        # size: (w, h) in scene units the image stands for (a proxy covers its full-res size)
+        self.prepareGeometryChange()
+        self._levels = {} if img is None else {0: img}
+        self.clear_tiles()
+        if img is None:
+            self._rect = QRectF()
+        else:
+            w, h = size or (img.shape[1], img.shape[0])
+            self._rect = QRectF(0, 0, w, h)
+        self.update()
+
+    def clear_tiles(self):
+        self._tiles.clear()
+        self.nbytes = 0
+
+    def boundingRect(self):
+        return self._rect
+
+    def level_for(self, device_scale):
+        # device_scale: device pixels per scene unit
+        img = self._levels[0]
+        px = device_scale * self._rect.width() / img.shape[1]  # device pixels per image pixel
+        i, longest = 0, max(img.shape[:2])
+        while px * (2 << i) <= 1 and longest >> (i + 1) >= 1:
+            i += 1
+        return i
+
+    def level(self, i):
+        # straight from level 0 rather than a halving chain: only levels on screen are ever allocated
+        lvl = self._levels.get(i)
+        if lvl is None:
+            img, f = self._levels[0], 1 << i
+            h, w = max(1, img.shape[0] // f), max(1, img.shape[1] // f)
+            # whole multiples of f keep INTER_AREA on its fast integer path; the cropped
+            # margin is under one level pixel, i.e. under a device pixel at this zoom
+            with span("tile_level", "resample", level=i):
+                lvl = cv2.resize(img[:h * f, :w * f], (w, h), interpolation=cv2.INTER_AREA)
+            self._levels[i] = lvl
+        return lvl
+
+    def _pixmap(self, key, img):
+        pm = self._tiles.get(key)
+        if pm is not None:
+            self._tiles.move_to_end(key)
+            return pm
+        _, tx, ty = key
+        t = self.tile
+        pm = qpixmap_from_bgr(img[ty * t:(ty + 1) * t, tx * t:(tx + 1) * t])
+        count("tiles.uploaded")
+        self._tiles[key] = pm
+        self.nbytes += pm.width() * pm.height() * pm.depth() // 8
+        while self.nbytes > self.budget_bytes and len(self._tiles) > 1:
+            _, old = self._tiles.popitem(last=False)
+            self.nbytes -= old.width() * old.height() * old.depth() // 8
+            count("tiles.evicted")
+        return pm
+
+    def paint(self, painter, option, widget=None):
+        if not self._levels:
+            return
+        lod = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        i = self.level_for(lod * painter.device().devicePixelRatioF())
+        img = self.level(i)
+        h, w = img.shape[:2]
+        full = self._levels[0]
+        sx = self._rect.width() / full.shape[1] * (1 << i)  # scene units per level pixel
+        sy = self._rect.height() / full.shape[0] * (1 << i)
+        r = option.exposedRect.intersected(self._rect)
+        if r.isEmpty():
+            return
+        t = self.tile
+        tx0, tx1 = int(r.left() / sx) // t, min(w - 1, int(r.right() / sx)) // t
+        ty0, ty1 = int(r.top() / sy) // t, min(h - 1, int(r.bottom() / sy)) // t
+        # tiles land on whole device pixels, without antialiasing: neighbours share the same rounded
+        # edge, so no blended seam is drawn along tile boundaries at fractional zooms
+        xf, dpr = painter.worldTransform(), painter.device().devicePixelRatioF()
+
+        def snap(x, y):
+            p = xf.map(QPointF(x, y))
+            return QPointF(round(p.x() * dpr) / dpr, round(p.y() * dpr) / dpr)
+
+        painter.save()
+        painter.setRenderHint(QtGui.QPainter.Antialiasing, False)
+        painter.resetTransform()
+        with span("ImageView.paint", "display", level=i):
+            for ty in range(ty0, ty1 + 1):
+                for tx in range(tx0, tx1 + 1):
+                    pm = self._pixmap((i, tx, ty), img)
+                    x, y = tx * t * sx, ty * t * sy
+                    painter.drawPixmap(QRectF(snap(x, y), snap(x + pm.width() * sx, y + pm.height() * sy)),
+                                       pm, QRectF(pm.rect()))
+        painter.restore()
 
 
 class ImageView(QGraphicsView):
-    def __init__(self):
+    def __init__(self, budget_bytes=TILE_BUDGET_BYTES):
         super().__init__()
         self.setScene(QGraphicsScene(self))
-        self.pix = QGraphicsPixmapItem()
+        self.pix = TiledImageItem(budget_bytes=budget_bytes)
         self.scene().addItem(self.pix)
         self.setBackgroundBrush(QtGui.QBrush(QtGui.QColor(24, 24, 24)))
         self.setRenderHints(QtGui.QPainter.Antialiasing | QtGui.QPainter.SmoothPixmapTransform)
         self.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self._shown = (None, None)
 
-    def set_image(self, img_bgr):
-        if img_bgr is None:
-            self.pix.setPixmap(QtGui.QPixmap())
-            return
-        pm = qpixmap_from_bgr(img_bgr)
-        self.pix.setPixmap(pm)
-        self.scene().setSceneRect(pm.rect())
+    def set_image(self, img_bgr, size=None):
+        # size: (w, h) the image stands for, e.g. the full-res size of a proxy preview.
+        # Returns False when this exact array is already on screen (nothing to redraw).
+        if self._shown[0] is img_bgr and self._shown[1] == size:
+            return False
+        self._shown = (img_bgr, size)
+        with span("ImageView.set_image", "display"):
+            self.pix.set_image(img_bgr, size)
+        self.scene().setSceneRect(self.pix.boundingRect())
+        return True
+
+    def wheelEvent(self, event):
+        # zoom around the cursor, between 1/64 and 32 screen pixels per image pixel
+        f = 1.25 ** (event.angleDelta().y() / 120)
+        s = self.transform().m11()
+        f = max(1 / 64, min(32.0, s * f)) / s
+        if f != 1.0:
+            self.scale(f, f)
+
+    def screen_scale(self):
+        # device pixels per scene pixel at the current zoom
+        return self.transform().m11() * self.devicePixelRatioF()
 
     def fit_in_view(self):
         rect = self.scene().itemsBoundingRect()
         if rect.isNull():
             return
-        self.fitInView(rect, Qt.KeepAspectRatio)
\ No newline at end of file
+        self.fitInView(rect, Qt.KeepAspectRatio)
+
+
+# --- Benchmark: python -m artfusion.imageview [MP ...] ---
+def benchmark(megapixels=(8, 24, 100), frames=20, viewport=(1280, 800)):
+    """Single whole-image pixmap vs tiles: show + first frame, then panning at 100% zoom."""
+    import time
+    import numpy as np
+    from PySide6.QtWidgets import QApplication, QGraphicsPixmapItem
+    app = QApplication.instance() or QApplication([])
+    rows = []
+    for mp in megapixels:
+        w = int((mp * 1e6 * 3 / 2) ** 0.5); h = int(mp * 1e6 / w)
+        small = np.random.default_rng(0).integers(0, 256, (h // 64 + 2, w // 64 + 2, 3), dtype=np.uint8)
+        img = cv2.resize(small, (w, h), interpolation=cv2.INTER_LINEAR)
+        for label in ("single", "tiled"):
+            view = ImageView(); view.resize(*viewport); view.show()
+            t0 = time.perf_counter()
+            if label == "single":
+                # the pre-tiling path: one pixmap of the whole image
+                view.scene().removeItem(view.pix)
+                item = QGraphicsPixmapItem(qpixmap_from_bgr(img)); view.scene().addItem(item)
+                view.scene().setSceneRect(item.boundingRect())
+                pix_bytes = w * h * 4
+            else:
+                view.set_image(img)
+            view.fit_in_view(); view.viewport().grab()
+            first = time.perf_counter() - t0
+            view.resetTransform(); view.centerOn(w / 2, h / 2); view.viewport().grab()
+            t0 = time.perf_counter()
+            for i in range(frames):
+                view.horizontalScrollBar().setValue(view.horizontalScrollBar().value() + 97)
+                view.viewport().grab()
+            pan_ms = (time.perf_counter() - t0) * 1000 / frames
+            if label == "tiled":
+                pix_bytes = view.pix.nbytes
+            rows.append({"mp": mp, "path": label, "first_frame_s": first, "pan_ms": pan_ms,
+                         "pixmap_mb": pix_bytes / 2**20})
+            print(f"{mp:4d} MP  {label:6s} first frame {first * 1000:8.1f} ms  pan {pan_ms:6.1f} ms/frame  "
+                  f"pixmaps {pix_bytes / 2**20:8.1f} MB")
+            view.close(); view.deleteLater()
+            app.processEvents()
+    return rows
+
+
+if __name__ == "__main__":
+    import sys
+    benchmark([int(a) for a in sys.argv[1:]] or (8, 24, 100))
\ No newline at end of file
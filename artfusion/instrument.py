@@ -0,0 +1,116 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+_NULL = nullcontext()
+
+
+class _Span:
+    __slots__ = ("prof", "name", "cat", "args", "t0")
+
+    def __init__(self, prof, name, cat, args):
+        self.prof, self.name, self.cat, self.args = prof, name, cat, args
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.prof._record(self.name, self.cat, self.t0, time.perf_counter(), self.args)
+        return False
+
+
+class Profiler:
+    """Spans, counters and gauges for the hot paths, kept in memory.
+
+    Disabled profilers hand out a shared no-op context, so instrumented code
+    costs one attribute check. Spans are aggregated per name and the most
+    recent `max_events` are kept for a Chrome trace (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self, enabled=False, max_events=200_000):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=max_events)
+        self._t0 = time.perf_counter()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._events.clear()
+            self.spans = {}     # name -> [cat, count, total_s, max_s, last_s]
+            self.counters = {}
+            self.gauges = {}
+
+    def span(self, name, cat="compute", **args):
+        return _Span(self, name, cat, args) if self.enabled else _NULL
+
+    def _record(self, name, cat, t0, t1, args):
+        dt = t1 - t0
+        with self._lock:
+            agg = self.spans.get(name)
+            if agg is None:
+                agg = self.spans[name] = [cat, 0, 0.0, 0.0, 0.0]
+            agg[1] += 1; agg[2] += dt; agg[3] = max(agg[3], dt); agg[4] = dt
+            self._events.append(("X", name, cat, threading.get_ident(), t0, dt, args))
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+                self._events.append(("C", name, "counter", 0, time.perf_counter(), 0.0, self.counters[name]))
+
+    def gauge(self, name, value):
+        if self.enabled:
+            with self._lock:
+                self.gauges[name] = value
+                self._events.append(("C", name, "gauge", 0, time.perf_counter(), 0.0, value))
+
+    def summary(self):
+        with self._lock:
+            return {
+                "spans": {n: {"cat": c, "count": k, "total_ms": t * 1000, "avg_ms": t * 1000 / k,
+                              "max_ms": m * 1000, "last_ms": last * 1000}
+                          for n, (c, k, t, m, last) in self.spans.items()},
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+            }
+
+    def by_category(self):
+        """Total seconds per category, e.g. compute vs convert vs upload."""
+        with self._lock:
+            out = {}
+            for cat, _k, total, _m, _l in self.spans.values():
+                out[cat] = out.get(cat, 0.0) + total
+            return out
+
+    def chrome_trace(self):
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+        trace = []
+        for ph, name, cat, tid, t0, dt, args in events:
+            ts = (t0 - self._t0) * 1e6
+            if ph == "X":
+                trace.append({"name": name, "cat": cat, "ph": "X", "pid": pid, "tid": tid, "ts": ts,
+                              "dur": dt * 1e6, "args": {k: repr(v) for k, v in args.items()}})
+            else:
+                trace.append({"name": name, "cat": cat, "ph": "C", "pid": pid, "tid": tid, "ts": ts,
+                              "args": {"value": args}})
+        return {"traceEvents": trace, "displayTimeUnit": "ms", "otherData": self.summary()}
+
+    def export(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+
+# ARTFUSION_PROFILE=1 turns instrumentation on; any other value (not 0) is also
+# the path the GUI writes a Chrome trace to when it closes.
+_env = os.environ.get("ARTFUSION_PROFILE", "")
+PROFILER = Profiler(enabled=_env not in ("", "0"))
+TRACE_PATH = _env if _env not in ("", "0", "1") else None
+span, count, gauge = PROFILER.span, PROFILER.count, PROFILER.gauge
\ No newline at end of file
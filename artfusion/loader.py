@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import os
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+from .utils import load_image
+from .instrument import span
+
+PREVIEW_MIN_BYTES = 4 * 1024 * 1024  # smaller files decode fully before the first paint anyway
+
+
+class _Job(QRunnable):
+    def __init__(self, fn, *args):
+        super().__init__()
+        self.fn, self.args = fn, args
+
+    def run(self):
+        self.fn(*self.args)
+
+
+class ImageLoader(QObject):
+    """Loads images on a background pool, reporting progress.
+
+    Large files are first decoded at reduced resolution (`preview`), then in
+    full (`loaded`). Opening another file into a slot supersedes the load
+    already running for it: its remaining signals are dropped.
+    """
+
+    progress = Signal(int, int, str)   # slot, percent, message
+    preview = Signal(int, object, float, str)  # slot, reduced image, reduction factor, path
+    loaded = Signal(int, object, str)  # slot, image, path
+    failed = Signal(int, str, str)     # slot, path, error
+
+    def __init__(self, parent=None, reduce=4):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+        self.reduce = reduce
+        self._gen = {}
+
+    def load(self, slot, path):
+        gen = self._gen[slot] = self._gen.get(slot, 0) + 1
+        self.pool.start(_Job(self._load, slot, path, gen))
+
+    def cancel_loads(self):
+        for slot in self._gen:
+            self._gen[slot] += 1
+
+    def wait(self, msecs=-1):
+        self.cancel_loads()
+        return self.pool.waitForDone(msecs)
+
+    def _current(self, slot, gen):
+        return self._gen.get(slot) == gen
+
+    def _load(self, slot, path, gen):
+        name = os.path.basename(path)
+        self.progress.emit(slot, 0, f"Chargement de {name}…")
+        try:
+            size = os.path.getsize(path)
+        except OSError as e:
+            self.failed.emit(slot, path, str(e))
+            return
+        if size >= PREVIEW_MIN_BYTES and self.reduce > 1:
+            with span("load_image.reduced", "io"):
+                small = load_image(path, reduce=self.reduce)
+            if small is not None and self._current(slot, gen):
+                self.preview.emit(slot, small, float(self.reduce), path)
+                self.progress.emit(slot, 30, f"Aperçu de {name}, décodage complet…")
+        if not self._current(slot, gen):
+            return
+        with span("load_image", "io"):
+            img = load_image(path)
+        if not self._current(slot, gen):
+            return
+        if img is None:
+            self.failed.emit(slot, path, "Impossible de charger l'image.")
+            return
+        self.progress.emit(slot, 100, f"{name} chargée")
+        self.loaded.emit(slot, img, path)
\ No newline at end of file
@@ -1,20 +1,115 @@
 # -*- coding: utf-8 -*-
 import os
+import time
+import cv2
 from PySide6 import QtGui
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtCore import Qt, QSize, QTimer, Signal
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QFileDialog, QVBoxLayout, QHBoxLayout, QLabel, QSlider, QComboBox,
     QFrame, QSplitter, QTabWidget, QMessageBox, QStyleFactory, QSizePolicy,
-    QGroupBox, QPushButton, QButtonGroup
+    QGroupBox, QPushButton, QButtonGroup, QListWidget, QListWidgetItem, QLineEdit, QCheckBox
 )
 
-from .utils import load_image, save_image
+from .utils import IdentityMemo, qpixmap_from_bgr
 from .imageview import ImageView
-from .ops import Ops
+from .ops import Ops, _glow_blur
+from .blend import MODES as BLEND_MODES
+from .render import PreviewRenderer
+from .loader import ImageLoader
+from .export import ExportQueue, TIFF_COMPRESSION
+from .pyramid import Pyramid
+from .history import History
+from .procpool import make_executor
+from .recipe import Recipe, parse_params, format_params
+from .cache import ResultCache
+from . import project, variants
+from .instrument import PROFILER, TRACE_PATH, gauge, span
+
+
+# tab key -> title; a tab's panel is built by _panel_<key>() the first time it is shown or needed
+PANELS = (
+    ("adjust", "Réglages"), ("filters", "Filtres"), ("fx", "Effets"), ("blend", "Fusion"),
+    ("color_match", "Filtre d'image"), ("otsu", "Otsu"), ("variants", "Variantes"), ("recipe", "Recette"),
+    ("export", "Export"),
+)
+# the session is written here every AUTOSAVE_S seconds (0: never); the previous one is kept in <dir>.prev
+AUTOSAVE_DIR = os.environ.get("ARTFUSION_AUTOSAVE_DIR") or os.path.join(os.path.expanduser("~"), ".artfusion", "session")
+AUTOSAVE_S = int(os.environ.get("ARTFUSION_AUTOSAVE_S", "30"))
+
+
+def rotate_session():
+    """Keep the last autosave aside for "Restaurer la session précédente"; once per app launch.
+
+    Returns where it went (pass it to ArtFusion), or None.
+    """
+    return project.rotate(AUTOSAVE_DIR) if AUTOSAVE_S else None
+# working precision of new recipes: chained Effets steps share a float buffer ("uint8": one round-trip per op)
+PRECISION = os.environ.get("ARTFUSION_PRECISION", "float32")
+VARIANT_FAMILIES = (
+    ("adjust", "Préréglages"), ("blend", "Modes de fusion"), ("sepia", "Sépia"), ("vignette", "Vignette"),
+    ("glow", "Lueur"),
+)
+
+
+def _fx_preview(img, full_width, steps, memo):
+    # Effets on a proxy: pixel-sized params shrink with it, and each step's output
+    # is frozen and memoized so moving a later slider leaves earlier steps cached
+    scale = img.shape[1] / full_width
+    for op, params in steps:
+        if op == "glow":
+            params = dict(params, blur_ks=max(1, int(params.get("blur_ks", 21) * scale) | 1))
+        key = (op, tuple(sorted(params.items())))
+
+        def compute(img=img, op=op, params=params):
+            out = getattr(Ops, op)(img, **params)
+            out.setflags(write=False)
+            return out
+
+        img = memo.get(img, key, compute)
+    return img
+
+
+def _otsu_preview(img, other, full_width, invert, feather, threshold_from):
+    # threshold from the full-res base (memoized); the feather kernel shrinks with the proxy
+    feather = int(round(feather * img.shape[1] / full_width))
+    return Ops.otsu_composite(img, other, invert=invert, feather=feather, threshold_from=threshold_from)
+
+
+FILTER_DEBOUNCE_MS = 60  # Filtres preview waits for the slider to settle this long
+
+
+def _filter_preview(img, full_width, op, params):
+    # Filtres on a proxy: pixel-sized params shrink with it, and a blur still large after
+    # that runs on a downsampled copy like large glows. Canny runs at proxy scale, the
+    # cartoon bilateral filter at half of it; "Appliquer" renders the exact full-res result.
+    scale = img.shape[1] / full_width
+    if op == "blur":
+        return _glow_blur(img, max(1, int(params["k"] * scale) | 1))
+    if op == "sharpen":
+        return Ops.sharpen(img, params["amount"], sigma=max(0.5, 2.0 * scale))
+    if op == "cartoon":
+        h, w = img.shape[:2]
+        small = cv2.resize(img, (max(1, w // 2), max(1, h // 2)), interpolation=cv2.INTER_AREA)
+        b = params["bilateral"]
+        color = cv2.resize(cv2.bilateralFilter(small, d=9, sigmaColor=b, sigmaSpace=b), (w, h))
+        return cv2.bitwise_and(color, Ops.cartoon_edges(img, params["edges_thresh"]))
+    return getattr(Ops, op)(img, **params)
+
+
+def _on_proxy(pyramid, width, height, fn, **kwargs):
+    # runs on the preview worker: render on the pyramid level closest to the on-screen size
+    with span("proxy", "resample"):
+        src = pyramid.for_size(width, height)
+    return fn(src, **kwargs)
 
 
 class ArtFusion(QMainWindow):
-    def __init__(self):
+    exported = Signal(object)  # ExportJob, emitted from an export worker
+    project_saved = Signal(str, object)  # path, error or None; emitted from a project writer
+
+    def __init__(self, previous_session=None):
+        # previous_session: from rotate_session(); left to the entry point so that a window
+        # built elsewhere (e.g. the startup benchmark) never moves the user's saved session
         super().__init__()
         self.setWindowTitle("ArtFusion Studio")
         self.resize(1480, 840)
@@ -23,13 +118,52 @@ class ArtFusion(QMainWindow):
         # Two images and per-image bases
         self.images = [None, None]
         self.bases = [None, None]
-        self.undo_stack = [[], []]
-        self.redo_stack = [[], []]
+        self.pyramids = [None, None]  # preview proxies of bases, built lazily
+        mb = int(os.environ.get("ARTFUSION_HISTORY_MB", "512"))
+        self.history = History(budget_bytes=mb * 1024 * 1024)
+        # Every edit is a recipe node; recipe.heads[slot] is the node each slot shows
+        self.recipe = Recipe(precision=PRECISION)
         self.active = 0  # 0 or 1
 
-        # Viewers
-        self.viewer1 = ImageView()
-        self.viewer2 = ImageView()
+        # Live previews are rendered off the GUI thread, latest request wins
+        self.renderer = PreviewRenderer(self)
+        self.renderer.ready.connect(self._on_preview_ready)
+        self.renderer.failed.connect(self._on_preview_failed)
+        # Full-resolution applies of local ops run tiled across cores (threads, or processes with ARTFUSION_BACKEND=process)
+        self.tiler = make_executor()
+        # Op results memoized on input content + params, so revisited settings are free
+        self.cache = ResultCache(
+            budget_bytes=int(os.environ.get("ARTFUSION_CACHE_MB", "256")) * 1024 * 1024,
+            spill_dir=os.environ.get("ARTFUSION_CACHE_DIR") or None,
+            disk_budget_bytes=int(os.environ.get("ARTFUSION_CACHE_DISK_MB", "1024")) * 1024 * 1024,
+        )
+        self._run_op = self.cache.wrap(self.tiler.apply, "op")
+        # Decoding and encoding happen off the GUI thread; large files show a reduced preview first
+        self.loader = ImageLoader(self)
+        self.loader.progress.connect(self._on_io_progress)
+        self.loader.preview.connect(self._on_load_preview)
+        self.loader.loaded.connect(self._on_loaded)
+        self.loader.failed.connect(self._on_io_failed)
+        self._loading = {}  # slot -> path being decoded
+        self._fx_memo = IdentityMemo()  # Effets live preview: proxy -> per-step output
+        self._variants = []  # (label, op, params, thumbnail) shown in the Variantes tab
+        self._variant_trial = None  # (slot, head) committed by the last variant click
+        self.exports = ExportQueue(workers=2, on_done=self.exported.emit)
+        self.exported.connect(self._on_exported)
+        # Session autosave: a background writer stores only the chunks that changed since its last save
+        self.autosave = project.ProjectWriter(AUTOSAVE_DIR)
+        self._previous_session = previous_session
+        self._project_writer = None  # writer of the project last saved with "Enregistrer projet…"
+        self._ui_pending = {}  # restored control values of panels not built yet
+        self.project_saved.connect(self._on_project_saved)
+        self._autosave_timer = QTimer(self); self._autosave_timer.timeout.connect(self._autosave)
+        if AUTOSAVE_S:
+            self._autosave_timer.start(AUTOSAVE_S * 1000)
+
+        # Viewers draw from tile pixmaps at the zoom level on screen, kept within this budget each
+        tiles = int(os.environ.get("ARTFUSION_TILES_MB", "192")) * 1024 * 1024
+        self.viewer1 = ImageView(budget_bytes=tiles)
+        self.viewer2 = ImageView(budget_bytes=tiles)
 
         # Left toolbar
         left = QWidget(); left_layout = QVBoxLayout(left)
@@ -48,6 +182,16 @@ class ArtFusion(QMainWindow):
         row.addWidget(btn_open1); row.addWidget(btn_open2)
         left_layout.addLayout(row); left_layout.addWidget(btn_save)
 
+        # Project row
+        pr = QHBoxLayout()
+        btn_open_project = QPushButton("Ouvrir projet…"); btn_save_project = QPushButton("Enregistrer projet…")
+        btn_open_project.clicked.connect(self.open_project); btn_save_project.clicked.connect(self.save_project)
+        pr.addWidget(btn_open_project); pr.addWidget(btn_save_project); left_layout.addLayout(pr)
+        self.btn_restore = QPushButton("Restaurer la session précédente")
+        self.btn_restore.setEnabled(self._previous_session is not None)
+        self.btn_restore.clicked.connect(lambda: self._restore_session(self._previous_session))
+        left_layout.addWidget(self.btn_restore)
+
         # Undo/Redo row
         ur = QHBoxLayout()
         btn_undo = QPushButton("Annuler")
@@ -76,15 +220,14 @@ class ArtFusion(QMainWindow):
         left_layout.addLayout(toggle_row)
         left_layout.addWidget(self._separator())
 
-        # Tabs
-        tabs = QTabWidget()
-        tabs.addTab(self._panel_adjust(), "Réglages")
-        tabs.addTab(self._panel_filters(), "Filtres")
-        tabs.addTab(self._panel_fx(), "Effets")
-        tabs.addTab(self._panel_blend(), "Fusion")
-        tabs.addTab(self._panel_color_match(), "Filtre d'image")
-        tabs.addTab(self._panel_otsu(), "Otsu")
-        left_layout.addWidget(tabs, 1)
+        # Tabs: empty pages until shown, so startup only builds the first panel
+        self.tabs = QTabWidget(); self._panels = {}
+        for key, title in PANELS:
+            page = QWidget(); QVBoxLayout(page).setContentsMargins(0, 0, 0, 0)
+            self.tabs.addTab(page, title); self._panels[key] = None
+        self.tabs.currentChanged.connect(lambda i: self._panel(PANELS[i][0]))
+        self._panel(PANELS[0][0])
+        left_layout.addWidget(self.tabs, 1)
         left_layout.addStretch(1)
 
         # Center: side by side viewers
@@ -98,8 +241,22 @@ class ArtFusion(QMainWindow):
         self.setCentralWidget(split_main)
 
         self.setAcceptDrops(True)
+        if PROFILER.enabled:
+            self._setup_profiler()
 
     # --- Panels ---
+    def _panel(self, key):
+        # builds the panel on first use; methods reading a panel's widgets call this first
+        w = self._panels[key]
+        if w is None:
+            with span("panel." + key, "gui"):
+                w = self._panels[key] = getattr(self, "_panel_" + key)()
+                self.tabs.widget([k for k, _ in PANELS].index(key)).layout().addWidget(w)
+            if key == "recipe":
+                self._refresh_recipe_list()
+            self._apply_ui_state()
+        return w
+
     def _panel_adjust(self):
         w = QWidget(); v = QVBoxLayout(w)
         self.s_brightness = self._labeled_slider(v, "Luminosité", -100, 100, 0)
@@ -117,6 +274,10 @@ class ArtFusion(QMainWindow):
         h = QHBoxLayout(); self.cmb_filter = QComboBox(); self.cmb_filter.addItems(["Gris", "Sepia", "Flou", "Netteté", "Contours", "Cartoon"])
         h.addWidget(QLabel("Filtre")); h.addWidget(self.cmb_filter, 1); v.addLayout(h)
         self.s_filter_strength = self._labeled_slider(v, "Intensité", 0, 300, 100)
+        self._filter_timer = QTimer(self); self._filter_timer.setSingleShot(True); self._filter_timer.setInterval(FILTER_DEBOUNCE_MS)
+        self._filter_timer.timeout.connect(self._apply_filter_live)
+        self.cmb_filter.currentTextChanged.connect(lambda _: self._filter_timer.start())
+        self.s_filter_strength.valueChanged.connect(lambda _: self._filter_timer.start())
         btn = QPushButton("Appliquer sur actif"); btn.clicked.connect(self.apply_filter)
         v.addWidget(btn); v.addStretch(1); return w
 
@@ -124,6 +285,8 @@ class ArtFusion(QMainWindow):
         w = QWidget(); v = QVBoxLayout(w)
         self.s_vignette = self._labeled_slider(v, "Vignette", 0, 100, 60)
         self.s_glow = self._labeled_slider(v, "Lueur", 0, 200, 60)
+        for s in (self.s_vignette, self.s_glow):
+            s.valueChanged.connect(self._apply_fx_live)
         btn = QPushButton("Appliquer sur actif"); btn.clicked.connect(self.apply_fx)
         v.addWidget(btn); v.addStretch(1); return w
 
@@ -131,9 +294,12 @@ class ArtFusion(QMainWindow):
         w = QWidget(); v = QVBoxLayout(w)
         from PySide6.QtWidgets import QLabel as _QLabel
         from PySide6.QtWidgets import QComboBox as _QComboBox
-        hb = QHBoxLayout(); self.cmb_blend = _QComboBox(); self.cmb_blend.addItems(["normal", "multiply", "screen", "overlay", "darken", "lighten", "add"])
+        hb = QHBoxLayout(); self.cmb_blend = _QComboBox(); self.cmb_blend.addItems(BLEND_MODES)
         hb.addWidget(_QLabel("Mode")); hb.addWidget(self.cmb_blend, 1); v.addLayout(hb)
         self.s_alpha = self._labeled_slider(v, "Opacité", 0, 100, 50)
+        self.chk_linear = QPushButton("Lumière linéaire"); self.chk_linear.setCheckable(True)
+        self.chk_linear.setToolTip("Fusionner en lumière linéaire (sRGB décodé) : dégradés et fondus plus naturels")
+        v.addWidget(self.chk_linear)
         btn_apply = QPushButton("Fusionner actif avec autre"); btn_apply.clicked.connect(self.apply_blend)
         v.addWidget(btn_apply); v.addStretch(1); return w
 
@@ -141,6 +307,8 @@ class ArtFusion(QMainWindow):
         w = QWidget(); v = QVBoxLayout(w)
         info = QLabel("Transférer l'ambiance de l'autre image vers l'image active."); info.setWordWrap(True)
         v.addWidget(info)
+        self.s_transfer = self._labeled_slider(v, "Intensité", 0, 100, 100)
+        self.s_transfer.valueChanged.connect(self._apply_color_transfer_live)
         btn_apply = QPushButton("Transfert Reinhard (autre → actif)"); btn_apply.clicked.connect(self.apply_color_transfer)
         v.addWidget(btn_apply); v.addStretch(1); return w
 
@@ -150,9 +318,55 @@ class ArtFusion(QMainWindow):
         info.setWordWrap(True); v.addWidget(info)
         self.chk_invert = QPushButton("Inverser le masque"); self.chk_invert.setCheckable(True)
         self.s_feather = self._labeled_slider(v, "Adoucissement (px)", 0, 51, 7)
+        self.chk_invert.toggled.connect(self._apply_otsu_live); self.s_feather.valueChanged.connect(self._apply_otsu_live)
         btn = QPushButton("Otsu → Composite (actif remplacé par autre)"); btn.clicked.connect(self.apply_otsu_composite)
         v.addWidget(self.chk_invert); v.addWidget(btn); v.addStretch(1); return w
 
+    def _panel_variants(self):
+        w = QWidget(); v = QVBoxLayout(w)
+        info = QLabel("Vignettes de plusieurs réglages de l'image active. Cliquer une vignette l'applique ; "
+                      "cliquer une autre remplace l'essai précédent.")
+        info.setWordWrap(True); v.addWidget(info)
+        h = QHBoxLayout(); self.cmb_variants = QComboBox()
+        for key, title in VARIANT_FAMILIES:
+            self.cmb_variants.addItem(title, key)
+        btn = QPushButton("Générer"); btn.clicked.connect(self.generate_variants)
+        h.addWidget(self.cmb_variants, 1); h.addWidget(btn); v.addLayout(h)
+        self.lst_variants = QListWidget(); self.lst_variants.setViewMode(QListWidget.IconMode)
+        self.lst_variants.setIconSize(QSize(128, 128)); self.lst_variants.setResizeMode(QListWidget.Adjust)
+        self.lst_variants.setMovement(QListWidget.Static); self.lst_variants.setSpacing(4)
+        self.lst_variants.itemClicked.connect(self._apply_variant)
+        btn_sheet = QPushButton("Exporter la planche…"); btn_sheet.clicked.connect(self.export_contact_sheet)
+        v.addWidget(self.lst_variants, 1); v.addWidget(btn_sheet); return w
+
+    def _panel_recipe(self):
+        w = QWidget(); v = QVBoxLayout(w)
+        info = QLabel("Étapes de l'image active. Modifier une étape ne recalcule que les suivantes.")
+        info.setWordWrap(True); v.addWidget(info)
+        self.lst_recipe = QListWidget(); self.lst_recipe.currentItemChanged.connect(self._on_recipe_item)
+        self.ed_recipe_params = QLineEdit(); self.ed_recipe_params.setPlaceholderText("clé=valeur, …")
+        btn_update = QPushButton("Mettre à jour l'étape"); btn_update.clicked.connect(self.retune_recipe_step)
+        row = QHBoxLayout()
+        btn_save = QPushButton("Enregistrer…"); btn_save.clicked.connect(self.save_recipe)
+        btn_load = QPushButton("Charger…"); btn_load.clicked.connect(self.load_recipe)
+        row.addWidget(btn_save); row.addWidget(btn_load)
+        v.addWidget(self.lst_recipe, 1); v.addWidget(self.ed_recipe_params); v.addWidget(btn_update); v.addLayout(row)
+        return w
+
+    def _panel_export(self):
+        w = QWidget(); v = QVBoxLayout(w)
+        h = QHBoxLayout(); self.cmb_export_fmt = QComboBox(); self.cmb_export_fmt.addItems(["PNG", "JPEG", "WebP", "TIFF"])
+        h.addWidget(QLabel("Format")); h.addWidget(self.cmb_export_fmt, 1); v.addLayout(h)
+        self.s_export_quality = self._labeled_slider(v, "Qualité JPEG/WebP", 1, 100, 95)
+        self.s_png_level = self._labeled_slider(v, "Compression PNG", 0, 9, 3)
+        self.chk_progressive = QCheckBox("JPEG progressif"); v.addWidget(self.chk_progressive)
+        self.chk_lossless = QCheckBox("WebP sans perte"); v.addWidget(self.chk_lossless)
+        h = QHBoxLayout(); self.cmb_tiff = QComboBox(); self.cmb_tiff.addItems(list(TIFF_COMPRESSION))
+        h.addWidget(QLabel("Compression TIFF")); h.addWidget(self.cmb_tiff, 1); v.addLayout(h)
+        btn_active = QPushButton("Exporter actif…"); btn_active.clicked.connect(self.save_active)
+        btn_both = QPushButton("Exporter les deux…"); btn_both.clicked.connect(self.export_both)
+        v.addWidget(btn_active); v.addWidget(btn_both); v.addStretch(1); return w
+
     # --- Helpers UI ---
     def _separator(self):
         line = QFrame(); line.setFrameShape(QFrame.HLine); line.setFrameShadow(QFrame.Sunken); return line
@@ -165,179 +379,620 @@ class ArtFusion(QMainWindow):
 
     def set_active(self, idx):
         self.active = idx
+        self._refresh_recipe_list()
+
+    def _set_image(self, slot, img):
+        # ops never write into their inputs, so bases can share the buffer; read-only
+        # images also let the result cache remember their fingerprint
+        img.setflags(write=False)
+        self.images[slot] = img; self.bases[slot] = img
+        self.pyramids[slot] = None
+
+    def _viewer(self, slot):
+        return self.viewer1 if slot == 0 else self.viewer2
+
+    def _preview_target(self, slot):
+        # on-screen size of the image in device pixels; the worker picks the matching proxy level
+        if self.pyramids[slot] is None:
+            self.pyramids[slot] = Pyramid(self.bases[slot])
+        h, w = self.bases[slot].shape[:2]
+        s = min(1.0, self._viewer(slot).screen_scale())
+        return self.pyramids[slot], max(1, int(w * s)), max(1, int(h * s))
 
     # --- Image I/O ---
     def open_image(self, slot):
         path, _ = QFileDialog.getOpenFileName(self, f"Ouvrir {slot+1}", "", "Images (*.png *.jpg *.jpeg *.bmp *.tif *.tiff)")
         if not path:
             return
-        img = load_image(path)
-        if img is None:
-            QMessageBox.critical(self, "Erreur", "Impossible de charger l'image.")
+        self._loading[slot] = path
+        self.loader.load(slot, path)
+
+    def _on_load_preview(self, slot, img, factor, path):
+        if self._loading.get(slot) != path:
             return
-        self.images[slot] = img.copy(); self.bases[slot] = img.copy()
-        self.undo_stack[slot].clear(); self.redo_stack[slot].clear()
+        h, w = img.shape[:2]
+        viewer = self._viewer(slot)
+        viewer.set_image(img, size=(int(w * factor), int(h * factor)))
+        QTimer.singleShot(0, viewer.fit_in_view)
+
+    def _on_loaded(self, slot, img, path):
+        if self._loading.get(slot) != path:
+            return
+        del self._loading[slot]
+        self._set_loaded(slot, img, path)
+
+    def _set_loaded(self, slot, img, path):
+        self._set_image(slot, img)
+        self.recipe.heads[slot] = self.recipe.add_source(img, path)
+        self.history.clear(slot)
+        self._release_sources()
         self._refresh_views()
+        self._refresh_recipe_list()
+
+    def _on_io_progress(self, slot, percent, message):
+        self.statusBar().showMessage(f"{message} ({percent} %)" if percent < 100 else message, 3000)
+
+    def _on_io_failed(self, slot, path, error):
+        if self._loading.get(slot) != path:
+            return
+        del self._loading[slot]
+        self._refresh_views()  # drop a reduced preview
+        QMessageBox.critical(self, "Erreur", error)
 
     def save_active(self):
         img = self.images[self.active]
         if img is None:
             return
-        path, _ = QFileDialog.getSaveFileName(self, "Exporter", f"image{self.active+1}.png", "Images (*.png *.jpg *.jpeg *.bmp *.tif *.tiff)")
+        ext = self._export_ext()
+        path, _ = QFileDialog.getSaveFileName(self, "Exporter", f"image{self.active+1}{ext}", "Images (*.png *.jpg *.jpeg *.webp *.bmp *.tif *.tiff)")
         if not path:
             return
+        self._export([(img, path if os.path.splitext(path)[1] else path + ext)])
+
+    def export_both(self):
+        if not self._need_both():
+            return
+        folder = QFileDialog.getExistingDirectory(self, "Exporter les deux images")
+        if not folder:
+            return
+        ext = self._export_ext()
+        self._export([(img, os.path.join(folder, f"image{i + 1}{ext}")) for i, img in enumerate(self.images)])
+
+    def _export_ext(self):
+        self._panel("export")
+        return {"PNG": ".png", "JPEG": ".jpg", "WebP": ".webp", "TIFF": ".tif"}[self.cmb_export_fmt.currentText()]
+
+    def _export_options(self, ext):
+        # only the options of the format actually written (the file name may override the combo)
+        self._panel("export")
+        ext = ext.lower()
+        if ext == ".png":
+            return {"compression": self.s_png_level.value()}
+        if ext in (".jpg", ".jpeg"):
+            return {"quality": self.s_export_quality.value(), "progressive": self.chk_progressive.isChecked()}
+        if ext == ".webp":
+            return {"quality": self.s_export_quality.value(), "lossless": self.chk_lossless.isChecked()}
+        if ext in (".tif", ".tiff"):
+            return {"compression": self.cmb_tiff.currentText()}
+        return {}
+
+    def _export(self, items):
+        # images are read-only, so the queue encodes them without a copy
         try:
-            save_image(path, img)
-        except Exception as e:
+            for img, path in items:
+                self.exports.submit(img, path, **self._export_options(os.path.splitext(path)[1]))
+        except ValueError as e:
             QMessageBox.critical(self, "Erreur", f"Échec de l'export: {e}")
+            return
+        self.statusBar().showMessage(f"Export en cours ({len(self.exports.pending())} en attente)…", 3000)
+
+    def _on_exported(self, job):
+        if job.status != "done":
+            QMessageBox.critical(self, "Erreur", f"Échec de l'export de {os.path.basename(job.path)}: {job.error}")
+            return
+        st = job.to_dict()
+        self.statusBar().showMessage(
+            f"Exporté : {os.path.basename(job.path)} — {st['bytes'] / 2**20:.1f} Mo en {st['encode_s']:.2f} s "
+            f"({st['mb_per_s']:.0f} Mo/s, attente {st['wait_s']:.2f} s)", 5000)
+
+    # --- Project: images, bases, recipe, history and panel settings in a memory-mapped directory ---
+    def _ui_state(self):
+        # panel controls by attribute name; panels not built yet keep the values they were restored with
+        ui = dict(self._ui_pending)
+        for name, w in vars(self).items():
+            if not name.startswith(("s_", "chk_", "cmb_")):
+                continue
+            if isinstance(w, QSlider):
+                ui[name] = w.value()
+            elif isinstance(w, QComboBox):
+                ui[name] = w.currentText()
+            elif isinstance(w, (QCheckBox, QPushButton)):
+                ui[name] = w.isChecked()
+        return ui
+
+    def _apply_ui_state(self):
+        for name in [n for n in self._ui_pending if hasattr(self, n)]:
+            w, value = getattr(self, name), self._ui_pending.pop(name)
+            if isinstance(w, QSlider):
+                w.setValue(int(value))
+            elif isinstance(w, QComboBox):
+                w.setCurrentText(str(value))
+            else:
+                w.setChecked(bool(value))
+
+    def _session_state(self):
+        # references only (images are read-only, history entries are never modified): cheap on the GUI thread
+        with span("project.snapshot", "gui"):
+            return {"active": self.active, "images": list(self.images), "bases": list(self.bases),
+                    "sources": self.recipe.source_images(), "recipe": self.recipe.to_dict(),
+                    "history": self.history.snapshot(), "ui": self._ui_state()}
+
+    def _autosave(self):
+        if any(img is not None for img in self.images):
+            self.autosave.save_async(self._session_state(), self._on_autosave_done)
+
+    def _on_autosave_done(self, error):
+        # writer thread; only failures are worth telling
+        if error is not None:
+            self.project_saved.emit(self.autosave.path, error)
+
+    def save_project(self):
+        if all(img is None for img in self.images):
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Enregistrer le projet", "projet.afproj", "Projet ArtFusion (*.afproj)")
+        if not path:
+            return
+        if self._project_writer is None or self._project_writer.path != path:
+            if self._project_writer is not None:
+                self._project_writer.close()
+            self._project_writer = project.ProjectWriter(path)
+        self._project_writer.save_async(self._session_state(), lambda err: self.project_saved.emit(path, err))
+        self.statusBar().showMessage("Enregistrement du projet…", 3000)
+
+    def _on_project_saved(self, path, error):
+        if error is not None and path == self.autosave.path:
+            self.statusBar().showMessage(f"Échec de la sauvegarde automatique : {error}", 10000)
+            return
+        if error is not None:
+            QMessageBox.critical(self, "Erreur", f"Échec de l'enregistrement du projet: {error}")
+            return
+        self.statusBar().showMessage(f"Projet enregistré : {os.path.basename(path)}", 5000)
+
+    def open_project(self):
+        path = QFileDialog.getExistingDirectory(self, "Ouvrir un projet")
+        if path:
+            self._restore_session(path)
+
+    def _restore_session(self, path):
+        t0 = time.perf_counter()
+        previous = path == self._previous_session
+        if previous and self.autosave.saves == 0 and self.autosave.idle:
+            # nothing of this session is on disk yet: take the previous autosave back rather than rewrite it
+            path = project.reclaim(path, self.autosave.path)
+        try:
+            state = project.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            QMessageBox.critical(self, "Erreur", f"Impossible d'ouvrir le projet: {e}")
+            return
+        self.loader.cancel_loads(); self._loading.clear()
+        self.recipe = state["recipe"]
+        for slot, img in enumerate(state["images"]):
+            if img is None:
+                self.images[slot] = self.bases[slot] = self.pyramids[slot] = None
+                continue
+            self._set_image(slot, img)
+            if state["bases"][slot] is not None:
+                self.bases[slot] = state["bases"][slot]
+            if self.recipe.heads[slot] in self.recipe.nodes:
+                self.recipe.store(self.recipe.heads[slot], img)
+        self.history.restore(state["history"])
+        self._release_sources()
+        self._ui_pending = dict(state["ui"]); self._apply_ui_state()
+        (self.btn_img1, self.btn_img2)[state["active"]].setChecked(True); self.set_active(state["active"])
+        if previous:
+            self.btn_restore.setEnabled(False)
+        if path == self.autosave.path:
+            self.autosave.remember(state)  # the next autosave writes only what changed
+        elif not previous:
+            if self._project_writer is None or self._project_writer.path != path:
+                self._project_writer = project.ProjectWriter(path)
+            self._project_writer.remember(state)  # saving it again writes only what changed
+        self._refresh_views()
+        self.statusBar().showMessage(f"Projet ouvert en {(time.perf_counter() - t0) * 1000:.0f} ms", 5000)
 
     # --- Undo/Redo on active ---
-    def push_state(self):
-        img = self.images[self.active]
-        if img is not None:
-            self.undo_stack[self.active].append(img.copy())
-            self.redo_stack[self.active].clear()
+    def _commit(self, img, head):
+        slot = self.active
+        self.history.push(slot, self.images[slot], img, meta=self.recipe.heads[slot])
+        self.recipe.heads[slot] = head
+        self._set_image(slot, img)
+        self._release_sources()  # the push may have cleared redo states or evicted old ones
+        self._refresh_views()
+        self._refresh_recipe_list()
+        self._show_history()
+
+    def _live_refs(self):
+        # recipe refs something can still show: the heads and every undo/redo state
+        return list(self.recipe.heads) + self.history.metas()
+
+    def _release_sources(self):
+        self.recipe.release(self._live_refs())
 
     def undo(self):
-        st = self.undo_stack[self.active]
-        if not st:
-            return
-        cur = self.images[self.active]
-        self.redo_stack[self.active].append(cur.copy())
-        self.images[self.active] = st.pop()
-        self.bases[self.active] = self.images[self.active].copy()
-        self._refresh_views()
+        self._step_history(self.history.undo)
 
     def redo(self):
-        st = self.redo_stack[self.active]
-        if not st:
+        self._step_history(self.history.redo)
+
+    def _step_history(self, step):
+        slot = self.active
+        res = step(slot, self.images[slot], meta=self.recipe.heads[slot])
+        if res is None:
             return
-        cur = self.images[self.active]
-        self.undo_stack[self.active].append(cur.copy())
-        self.images[self.active] = st.pop()
-        self.bases[self.active] = self.images[self.active].copy()
+        img, self.recipe.heads[slot] = res
+        self._set_image(slot, img)
         self._refresh_views()
+        self._refresh_recipe_list()
+        self._show_history()
+
+    def _show_history(self):
+        self.statusBar().showMessage(
+            f"Historique : {len(self.history)} états, {self.history.nbytes / 2**20:.1f} Mo "
+            f"/ {self.history.budget_bytes / 2**20:.0f} Mo", 3000)
 
     # --- Adjustments ---
     def _apply_adjust_live(self):
         base = self.bases[self.active]
         if base is None:
             return
-        img = Ops.adjust(
-            base,
+        with span("_apply_adjust_live", "gui"):
+            self._request_adjust_preview()
+
+    def _request_adjust_preview(self):
+        self.renderer.request(
+            self.active, _on_proxy, *self._preview_target(self.active), Ops.adjust,
             brightness=self.s_brightness.value(),
             contrast=self.s_contrast.value() / 100.0,
             saturation=self.s_saturation.value() / 100.0,
             hue=self.s_hue.value(),
             gamma=self.s_gamma.value() / 100.0,
         )
-        self._set_view_temp(img)
 
     def apply_adjust(self):
-        base = self.bases[self.active]
-        if base is None:
+        if self.bases[self.active] is None:
             return
-        self.push_state()
-        img = Ops.adjust(
-            base,
+        self._apply_op(
+            "adjust",
             brightness=self.s_brightness.value(),
             contrast=self.s_contrast.value() / 100.0,
             saturation=self.s_saturation.value() / 100.0,
             hue=self.s_hue.value(),
             gamma=self.s_gamma.value() / 100.0,
         )
-        self.images[self.active] = img
-        self.bases[self.active] = img.copy()
-        self._refresh_views()
 
     # --- Filters ---
+    def _filter_op(self, name, strength):
+        if name == "Gris":
+            return "grayscale", {}
+        if name == "Sepia":
+            return "sepia", {"strength": strength}
+        if name == "Flou":
+            return "blur", {"k": int(1 + strength * 30)}
+        if name == "Netteté":
+            return "sharpen", {"amount": 0.5 + strength}
+        if name == "Contours":
+            t = int(50 + strength * 200); return "edges", {"thresh1": t // 2, "thresh2": t}
+        return "cartoon", {"bilateral": int(5 + strength * 30), "edges_thresh": int(80 + strength * 200)}
+
+    def _apply_filter_live(self):
+        base = self.bases[self.active]
+        if base is None:
+            return
+        op, params = self._filter_op(self.cmb_filter.currentText(), self.s_filter_strength.value() / 100.0)
+        with span("_apply_filter_live", "gui", op=op):
+            self.renderer.request(self.active, _on_proxy, *self._preview_target(self.active), _filter_preview,
+                                  full_width=base.shape[1], op=op, params=params)
+
     def apply_filter(self):
-        img = self.images[self.active]
-        if img is None:
+        if self.images[self.active] is None:
             return
+        self._panel("filters"); self._filter_timer.stop()  # no debounced preview on top of the result
         name = self.cmb_filter.currentText(); strength = self.s_filter_strength.value() / 100.0
-        self.push_state()
-        if name == "Gris":
-            img = Ops.grayscale(img)
-        elif name == "Sepia":
-            img = Ops.sepia(img, strength)
-        elif name == "Flou":
-            k = int(1 + strength * 30); img = Ops.blur(img, k)
-        elif name == "Netteté":
-            img = Ops.sharpen(img, amount=0.5 + strength)
-        elif name == "Contours":
-            t = int(50 + strength * 200); img = Ops.edges(img, t // 2, t)
-        elif name == "Cartoon":
-            img = Ops.cartoon(img, bilateral=int(5 + strength * 30), edges_thresh=int(80 + strength * 200))
-        self.images[self.active] = img; self.bases[self.active] = img.copy(); self._refresh_views()
+        op, params = self._filter_op(name, strength)
+        with span("apply_filter", "gui", op=op):
+            self._apply_op(op, **params)
 
     # --- FX ---
-    def apply_fx(self):
-        img = self.images[self.active]
-        if img is None:
-            return
-        self.push_state(); out = img.copy()
+    def _fx_steps(self):
+        steps = []
         if self.s_vignette.value() > 0:
-            out = Ops.vignette(out, strength=self.s_vignette.value() / 100.0)
+            steps.append(("vignette", {"strength": self.s_vignette.value() / 100.0}))
         if self.s_glow.value() > 0:
-            out = Ops.glow(out, amount=self.s_glow.value() / 100.0)
-        self.images[self.active] = out; self.bases[self.active] = out.copy(); self._refresh_views()
+            steps.append(("glow", {"amount": self.s_glow.value() / 100.0}))
+        return steps
+
+    def _apply_fx_live(self):
+        base = self.bases[self.active]
+        if base is None:
+            return
+        with span("_apply_fx_live", "gui"):
+            self.renderer.request(self.active, _on_proxy, *self._preview_target(self.active), _fx_preview,
+                                  full_width=base.shape[1], steps=self._fx_steps(), memo=self._fx_memo)
+
+    def apply_fx(self):
+        if self.images[self.active] is None:
+            return
+        self._panel("fx")
+        steps = self._fx_steps()
+        if steps:
+            self._apply_chain([(op, False, params) for op, params in steps])
+
+    def _need_both(self):
+        if self.images[self.active] is None or self.images[1 - self.active] is None:
+            QMessageBox.information(self, "Info", "Chargez les deux images.")
+            return False
+        return True
 
     # --- Blend active with other ---
     def apply_blend(self):
-        a = self.images[self.active]
-        b = self.images[1 - self.active]
-        if a is None or b is None:
-            QMessageBox.information(self, "Info", "Chargez les deux images.")
+        if not self._need_both():
             return
-        self.push_state()
+        self._panel("blend")
         mode = self.cmb_blend.currentText(); alpha = self.s_alpha.value() / 100.0
-        out = Ops.blend(a, b, mode=mode, alpha=alpha)
-        self.images[self.active] = out; self.bases[self.active] = out.copy(); self._refresh_views()
+        linear = {"linear": True} if self.chk_linear.isChecked() else {}
+        self._apply_op("blend", other=True, mode=mode, alpha=alpha, **linear)
 
     # --- Color transfer other → active ---
+    def _apply_color_transfer_live(self):
+        base, other = self.bases[self.active], self.images[1 - self.active]
+        if base is None or other is None:
+            return
+        # statistics come from the full-res base (memoized), so the proxy matches the final result
+        with span("_apply_color_transfer_live", "gui"):
+            self.renderer.request(self.active, _on_proxy, *self._preview_target(self.active),
+                                  Ops.reinhard_color_transfer, target=other,
+                                  strength=self.s_transfer.value() / 100.0, stats_from=base)
+
     def apply_color_transfer(self):
-        a = self.images[self.active]
-        b = self.images[1 - self.active]
-        if a is None or b is None:
-            QMessageBox.information(self, "Info", "Chargez les deux images.")
+        if not self._need_both():
             return
-        self.push_state()
-        out = Ops.reinhard_color_transfer(a, b)
-        self.images[self.active] = out; self.bases[self.active] = out.copy(); self._refresh_views()
+        self._panel("color_match")
+        self._apply_op("reinhard_color_transfer", other=True, strength=self.s_transfer.value() / 100.0)
 
     # --- Otsu composite ---
+    def _apply_otsu_live(self):
+        base, other = self.bases[self.active], self.images[1 - self.active]
+        if base is None or other is None:
+            return
+        with span("_apply_otsu_live", "gui"):
+            self.renderer.request(self.active, _on_proxy, *self._preview_target(self.active), _otsu_preview,
+                                  other=other, full_width=base.shape[1], invert=self.chk_invert.isChecked(),
+                                  feather=self.s_feather.value(), threshold_from=base)
+
     def apply_otsu_composite(self):
-        a = self.images[self.active]
-        b = self.images[1 - self.active]
-        if a is None or b is None:
-            QMessageBox.information(self, "Info", "Chargez les deux images.")
+        if not self._need_both():
             return
-        self.push_state()
+        self._panel("otsu")
         invert = self.chk_invert.isChecked(); feather = self.s_feather.value()
-        mask = Ops.otsu_mask(a, invert=invert, feather=feather)
-        out = Ops.composite_by_mask(a, b, mask)
-        self.images[self.active] = out; self.bases[self.active] = out.copy(); self._refresh_views()
+        self._apply_op("otsu_composite", other=True, invert=invert, feather=feather)
+
+    # --- Variants: thumbnails of many settings, rendered together from one small proxy ---
+    def generate_variants(self):
+        if self.images[self.active] is None:
+            return
+        self._panel("variants")
+        family = self.cmb_variants.currentData()
+        if family == "blend" and not self._need_both():
+            return
+        # the smallest pyramid level covering a thumbnail; shared inputs are scaled from it once
+        src = self._preview_target(self.active)[0].for_size(variants.THUMB, variants.THUMB)
+        other = None
+        if family == "blend":
+            other = self._preview_target(1 - self.active)[0].for_size(src.shape[1], src.shape[0])
+        alpha = self.s_alpha.value() / 100.0 if self._panels["blend"] is not None else 0.5
+        with span("variants." + family, "compute"):
+            self._variants = variants.render(src, family, other, alpha=alpha,
+                                             full_width=self.bases[self.active].shape[1])
+        self._variant_trial = None
+        self.lst_variants.clear()
+        for i, (label, _op, _params, thumb) in enumerate(self._variants):
+            item = QListWidgetItem(QtGui.QIcon(qpixmap_from_bgr(thumb)), label)
+            item.setData(Qt.UserRole, i)
+            self.lst_variants.addItem(item)
+
+    def _apply_variant(self, item):
+        _label, op, params, _thumb = self._variants[item.data(Qt.UserRole)]
+        if op == "blend" and not self._need_both():
+            return
+        if self._variant_trial == (self.active, self.recipe.heads[self.active]):
+            self.undo()  # trying another variant replaces the previous try
+        self._apply_op(op, other=op == "blend", **params)
+        self._variant_trial = (self.active, self.recipe.heads[self.active])
+
+    def export_contact_sheet(self):
+        if not self._variants:
+            return
+        ext = self._export_ext()
+        path, _ = QFileDialog.getSaveFileName(self, "Exporter la planche", f"planche{ext}", "Images (*.png *.jpg *.jpeg *.webp *.bmp *.tif *.tiff)")
+        if not path:
+            return
+        sheet = variants.contact_sheet([(label, thumb) for label, _, _, thumb in self._variants])
+        sheet.setflags(write=False)
+        self._export([(sheet, path if os.path.splitext(path)[1] else path + ext)])
+
+    # --- Recipe ---
+    def _apply_op(self, op, other=False, **params):
+        self._apply_chain([(op, other, params)])
+
+    def _apply_chain(self, steps):
+        # steps: (op, uses_other_slot, params); appended to the active head, committed as one edit,
+        # each step chained to the previous one so the recipe may compute them on one float buffer
+        slot = self.active
+        heads = self.recipe.heads
+        if heads[slot] is None or (any(s[1] for s in steps) and heads[1 - slot] is None):
+            self.statusBar().showMessage("Aucune image à modifier.", 3000)
+            return
+        for s in (slot, 1 - slot):
+            if self.images[s] is not None and heads[s] in self.recipe.nodes:
+                self.recipe.store(heads[s], self.images[s])  # the shown image is the head's output
+        head = heads[slot]
+        for i, (op, other, params) in enumerate(steps):
+            head = self.recipe.add(op, [head, heads[1 - slot]] if other else [head], params, chained=i > 0)
+        with span("apply", "compute", ops=[s[0] for s in steps]):
+            img = self.recipe.evaluate(head, apply=self._run_op)
+        with span("commit", "gui"):
+            self._commit(img, head)
+
+    def _refresh_recipe_list(self):
+        if self._panels["recipe"] is None:
+            return  # filled when the tab is first shown
+        self.lst_recipe.clear()
+        head = self.recipe.heads[self.active]
+        if head is None:
+            return
+        for nid in self.recipe.chain(head):
+            node = self.recipe.nodes[nid]
+            extra = " + autre" if len(node.inputs) > 1 else ""
+            item = QListWidgetItem(f"{node.op}{extra}  ({format_params(node.params)})")
+            item.setData(Qt.UserRole, nid)
+            self.lst_recipe.addItem(item)
+
+    def _on_recipe_item(self, item, _prev=None):
+        if item is not None:
+            node = self.recipe.nodes[item.data(Qt.UserRole)]
+            self.ed_recipe_params.setText(format_params(node.params))
+
+    def retune_recipe_step(self):
+        item = self.lst_recipe.currentItem()
+        if item is None:
+            return
+        try:
+            params = parse_params(self.ed_recipe_params.text())
+            head = self.recipe.retune(self.recipe.heads[self.active], item.data(Qt.UserRole), **params)
+            img = self.recipe.evaluate(head, apply=self._run_op)
+        except Exception as e:
+            QMessageBox.critical(self, "Erreur", f"Étape invalide : {e}")
+            return
+        row = self.lst_recipe.currentRow()
+        self._commit(img, head)
+        self.lst_recipe.setCurrentRow(row)
+
+    def save_recipe(self):
+        if all(h is None for h in self.recipe.heads):
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Enregistrer la recette", "recette.json", "Recette (*.json)")
+        if not path:
+            return
+        try:
+            self.recipe.save(path)
+        except Exception as e:
+            QMessageBox.critical(self, "Erreur", f"Échec de l'enregistrement: {e}")
+
+    def load_recipe(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Charger une recette", "", "Recette (*.json)")
+        if not path:
+            return
+        try:
+            recipe = Recipe.load(path)
+            outputs = recipe.run(apply=self._run_op)  # replays from the source files at full resolution
+        except Exception as e:
+            QMessageBox.critical(self, "Erreur", f"Impossible de rejouer la recette: {e}")
+            return
+        self.recipe = recipe
+        for slot, img in enumerate(outputs):
+            if img is not None:
+                self._set_image(slot, img)
+            else:
+                # no head in the recipe: an image left here would have nothing to apply to
+                self.images[slot] = self.bases[slot] = self.pyramids[slot] = None
+            self.history.clear(slot)
+        self._refresh_views()
+        self._refresh_recipe_list()
 
     # --- View refresh ---
     def _refresh_views(self):
-        if self.images[0] is not None:
-            self.viewer1.set_image(self.images[0])
-        else:
-            self.viewer1.set_image(None)
-        if self.images[1] is not None:
-            self.viewer2.set_image(self.images[1])
-        else:
-            self.viewer2.set_image(None)
-        QTimer.singleShot(0, self.viewer1.fit_in_view)
-        QTimer.singleShot(0, self.viewer2.fit_in_view)
+        self.renderer.cancel()  # a late preview must not overwrite a committed image
+        # only the viewer whose image actually changed re-uploads and refits
+        with span("_refresh_views", "display"):
+            for slot, viewer in enumerate((self.viewer1, self.viewer2)):
+                if slot in self._loading:
+                    continue  # keeps the reduced preview until the full decode lands
+                if viewer.set_image(self.images[slot]):
+                    QTimer.singleShot(0, viewer.fit_in_view)
+        self._update_gauges()
+
+    def _on_preview_ready(self, slot, img):
+        if slot != self.active or self.bases[slot] is None:
+            return
+        self._set_view_temp(img)
+        st = self.renderer.stats()
+        self.statusBar().showMessage(
+            f"Aperçu {st['last_ms']:.0f} ms (moy. {st['avg_ms']:.0f}, max {st['max_ms']:.0f}) — "
+            f"rendus {st['rendered']}/{st['requested']}, ignorés {st['dropped']}, erreurs {st['errors']}, "
+            f"> {st['target_ms']:.0f} ms: {st['late']}", 3000)
+
+    def _on_preview_failed(self, slot, error):
+        self.statusBar().showMessage(f"Erreur d'aperçu : {error}", 5000)
 
     def _set_view_temp(self, img):
-        # live preview only on active viewer
-        if self.active == 0:
-            self.viewer1.set_image(img)
-        else:
-            self.viewer2.set_image(img)
+        # live preview only on active viewer, drawn at the full-res size it stands for
+        h, w = self.bases[self.active].shape[:2]
+        self._viewer(self.active).set_image(img, size=(w, h))
+
+    # --- Instrumentation (ARTFUSION_PROFILE) ---
+    def _setup_profiler(self):
+        self.lbl_profile = QLabel(); self.statusBar().addPermanentWidget(self.lbl_profile)
+        self._profile_timer = QTimer(self); self._profile_timer.timeout.connect(self._update_profile_overlay)
+        self._profile_timer.start(500)
+        sc = QtGui.QShortcut(QtGui.QKeySequence("Ctrl+Shift+P"), self); sc.activated.connect(self.export_trace)
+
+    def _update_gauges(self):
+        if not PROFILER.enabled:
+            return
+        shown = {id(a): a.nbytes for a in self.images + self.bases if a is not None}
+        gauge("mem.images_mb", sum(shown.values()) / 2**20)
+        gauge("mem.history_mb", self.history.nbytes / 2**20)
+        gauge("mem.cache_mb", self.cache.stats()["nbytes"] / 2**20)
+        gauge("mem.recipe_mb", self.recipe.cache_nbytes() / 2**20)
+        gauge("mem.tiles_mb", (self.viewer1.pix.nbytes + self.viewer2.pix.nbytes) / 2**20)
+
+    def _update_profile_overlay(self):
+        s = PROFILER.summary(); spans, c, g = s["spans"], s["counters"], s["gauges"]
+        last = lambda n: spans[n]["last_ms"] if n in spans else 0.0
+        self.lbl_profile.setText(
+            f"calcul {last('preview'):.0f} ms · conversion {last('to_bgra') + last('wrap_qimage'):.1f} ms · "
+            f"envoi {last('QPixmap.fromImage'):.1f} ms | aperçus {c.get('preview.rendered', 0)}"
+            f"/{c.get('preview.requested', 0)} | images {g.get('mem.images_mb', 0):.0f} Mo, "
+            f"historique {g.get('mem.history_mb', 0):.0f} Mo, cache {g.get('mem.cache_mb', 0):.0f} Mo, "
+            f"tuiles {g.get('mem.tiles_mb', 0):.0f} Mo")
+        self.lbl_profile.setToolTip("\n".join(
+            f"{n}: {v['count']}× moy. {v['avg_ms']:.1f} ms, max {v['max_ms']:.1f} ms ({v['cat']})"
+            for n, v in sorted(spans.items(), key=lambda kv: -kv[1]["total_ms"])))
+
+    def export_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Exporter la trace", "artfusion-trace.json", "Trace Chrome (*.json)")
+        if not path:
+            return
+        try:
+            PROFILER.export(path)
+        except OSError as e:
+            QMessageBox.critical(self, "Erreur", f"Échec de l'export: {e}")
+
+    def closeEvent(self, event):
+        if TRACE_PATH:
+            PROFILER.export(TRACE_PATH)
+        self.loader.wait()
+        self.renderer.cancel(); self.renderer.pool.waitForDone()
+        self.exports.shutdown(wait=True)  # queued exports still get written
+        self._autosave_timer.stop()
+        if AUTOSAVE_S:
+            self._autosave()  # the final save only writes what changed since the last one
+        self.autosave.close()
+        if self._project_writer is not None:
+            self._project_writer.close()
+        self.history.shutdown()
+        self.tiler.close()
+        super().closeEvent(event)
 
     # --- Theme ---
     def _apply_dark_theme(self):
@@ -357,4 +1012,4 @@ class ArtFusion(QMainWindow):
         palette.setColor(QtGui.QPalette.Highlight, QtGui.QColor(64, 128, 255))
         palette.setColor(QtGui.QPalette.HighlightedText, Qt.black)
         from PySide6.QtWidgets import QApplication as _QApp
-        _QApp.setPalette(palette)
+        _QApp.setPalette(palette)
\ No newline at end of file
@@ -1,11 +1,190 @@
+import functools
+import threading
+from collections import OrderedDict
 import numpy as np
 import cv2
-from .utils import clamp01
+from .utils import IdentityMemo, clamp01
+from . import blend as _blend
+
+
+@functools.lru_cache(maxsize=256)
+def _adjust_luts(brightness, contrast, saturation, hue, gamma):
+    # Every stage of the float pipeline in _adjust_reference ends in a uint8
+    # truncation, so each one is an exact 256-entry table: the tone curve
+    # (brightness/contrast), H/S on the uint8 HSV image, and the gamma curve.
+    # Identity tables come back as None so the lookup can be skipped.
+    v = np.arange(256, dtype=np.float32)
+    ident = np.arange(256, dtype=np.uint8)
+    tone = (clamp01(v / 255.0 * contrast + (brightness / 255.0)) * 255).astype(np.uint8)
+    h = ((v + (hue / 2)) % 180).astype(np.uint8)
+    s = np.clip(v * saturation, 0, 255).astype(np.uint8)
+    hsv = np.stack([h, s, ident], axis=-1).reshape(256, 1, 3)
+    g = (np.power(np.maximum(v / 255.0, 1e-8), 1.0 / max(gamma, 1e-6)) * 255).astype(np.uint8)
+    if np.array_equal(tone, ident):
+        tone = None
+    if np.array_equal(h[:180], ident[:180]) and np.array_equal(s, ident):
+        hsv = None
+    if np.array_equal(g, ident):
+        g = None
+    for lut in (tone, hsv, g):
+        if lut is not None:
+            lut.setflags(write=False)
+    return tone, hsv, g
+
+
+SEPIA = np.array([[0.272, 0.534, 0.131],
+                  [0.349, 0.686, 0.168],
+                  [0.393, 0.769, 0.189]], dtype=np.float32)  # BGR -> sepia BGR, applied as img @ SEPIA.T
+SEPIA.setflags(write=False)
+
+_vignette_masks = OrderedDict()  # (h, w, strength) -> float32 mask, most recently used last
+_vignette_lock = threading.Lock()
+VIGNETTE_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def _vignette_mask(h, w, strength):
+    # geometry only: one (h, w) float32 plane broadcast over the channels
+    key = (h, w, float(strength))
+    with _vignette_lock:
+        mask = _vignette_masks.get(key)
+        if mask is not None:
+            _vignette_masks.move_to_end(key)
+            return mask
+    cy, cx = h / 2, w / 2
+    dy2 = ((np.arange(h, dtype=np.float32) - cy) ** 2)[:, None]
+    dx2 = ((np.arange(w, dtype=np.float32) - cx) ** 2)[None, :]
+    mask = np.sqrt(dy2 + dx2)
+    mask *= np.float32(strength / np.sqrt(cx ** 2 + cy ** 2))
+    np.subtract(1, mask, out=mask)
+    np.clip(mask, 0, 1, out=mask)
+    mask.setflags(write=False)
+    if mask.nbytes <= VIGNETTE_CACHE_BYTES:
+        with _vignette_lock:
+            _vignette_masks[key] = mask
+            total = sum(m.nbytes for m in _vignette_masks.values())
+            while total > VIGNETTE_CACHE_BYTES:
+                total -= _vignette_masks.popitem(last=False)[1].nbytes
+    return mask
+
+
+GLOW_MIN_SIGMA = 4.0  # pyramid levels keep at least this blur sigma, in reduced pixels
+
+
+def _glow_factor(blur_ks):
+    # Downsampling factor for a Gaussian of this kernel size: large blurs run on
+    # a 1/2, 1/4, ... image and are upsampled back; small ones stay exact.
+    sigma = 0.3 * ((blur_ks - 1) * 0.5 - 1) + 0.8  # OpenCV's sigma for a given ksize
+    f = 1
+    while sigma / (2 * f) >= GLOW_MIN_SIGMA:
+        f *= 2
+    return f
+
+
+def _glow_blur(img, blur_ks):
+    h, w = img.shape[:2]
+    f = _glow_factor(blur_ks)
+    while f > 1 and min(h, w) < 8 * f:
+        f //= 2
+    if f == 1:
+        return cv2.GaussianBlur(img, (blur_ks, blur_ks), 0)
+    sigma = 0.3 * ((blur_ks - 1) * 0.5 - 1) + 0.8
+    small = cv2.resize(img, ((w + f - 1) // f, (h + f - 1) // f), interpolation=cv2.INTER_AREA)
+    small = cv2.GaussianBlur(small, (0, 0), sigma / f)
+    return cv2.resize(small, (w, h), interpolation=cv2.INTER_LINEAR)
+
+
+# frozen preview-sized image -> its blur, reused while only `amount` moves; full-size
+# blurs are not kept since they would outlive the edit by as much as the image itself
+_glow_blurs = IdentityMemo(per_array=1)
+GLOW_MEMO_PIXELS = 4_000_000
+
+
+# --- Reinhard: LAB statistics and uint8 LAB conversions of frozen images ---
+STATS_PIXELS = 4_000_000  # larger images estimate their LAB statistics from a strided sample
+_lab_stats = IdentityMemo(per_array=2)
+_lab_images = IdentityMemo(per_array=1)  # preview-sized sources only, like _glow_blurs
+
+
+def _lab(img):
+    if img.shape[0] * img.shape[1] <= GLOW_MEMO_PIXELS:
+        return _lab_images.get(img, "lab", lambda: cv2.cvtColor(img, cv2.COLOR_BGR2LAB))
+    return cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+
+
+def lab_stats(img, max_pixels=STATS_PIXELS):
+    """Per-channel (means, stds) of img in uint8 LAB, from histograms."""
+    def compute():
+        h, w = img.shape[:2]
+        step = max(1, int(np.ceil(np.sqrt(h * w / max_pixels)))) if max_pixels else 1
+        lab = cv2.cvtColor(np.ascontiguousarray(img[::step, ::step]), cv2.COLOR_BGR2LAB)
+        v = np.arange(256, dtype=np.float64)
+        means, stds = [], []
+        for c in range(3):
+            hist = cv2.calcHist([lab], [c], None, [256], [0, 256]).ravel().astype(np.float64)
+            n = hist.sum()
+            m = (hist @ v) / n
+            means.append(m)
+            stds.append(np.sqrt(max(0.0, (hist @ (v * v)) / n - m * m)) + 1e-6)
+        return tuple(means), tuple(stds)
+
+    return _lab_stats.get(img, max_pixels, compute)
+
+
+@functools.lru_cache(maxsize=64)
+def _reinhard_lut(smean, sstd, tmean, tstd):
+    # the per-channel affine map of the float version, tabulated on uint8 LAB
+    v = np.arange(256, dtype=np.float32)
+    chans = []
+    for c in range(3):
+        mapped = (v - np.float32(smean[c])) * np.float32(tstd[c] / sstd[c]) + np.float32(tmean[c])
+        chans.append(np.clip(mapped, 0, 255).astype(np.uint8))
+    lut = np.stack(chans, axis=-1).reshape(256, 1, 3)
+    lut.setflags(write=False)
+    return lut
+
+
+def reinhard_lut(source, target):
+    return _reinhard_lut(*lab_stats(source), *lab_stats(target))
+
+
+def reinhard_apply(source, lut, strength=1.0):
+    # the per-pixel half of the transfer, so it can run on bands of source
+    out = cv2.cvtColor(cv2.LUT(_lab(source), lut), cv2.COLOR_LAB2BGR)
+    if strength < 1:
+        out = cv2.addWeighted(source, 1.0 - strength, out, strength, 0)
+    return out
+
+
+# --- Otsu: threshold per frozen image; gray planes kept for preview-sized ones ---
+_otsu = IdentityMemo(per_array=2)
+
+
+def _gray(img):
+    if img.shape[0] * img.shape[1] <= GLOW_MEMO_PIXELS:
+        return _otsu.get(img, "gray", lambda: cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def otsu_threshold(img):
+    return _otsu.get(img, "thresh", lambda: cv2.threshold(_gray(img), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[0])
 
 
 class Ops:
     @staticmethod
     def adjust(img, brightness=0, contrast=1.0, saturation=1.0, hue=0, gamma=1.0):
+        # LUT engine: bit-identical to _adjust_reference for uint8 BGR input
+        tone, hsv_lut, gamma_lut = _adjust_luts(brightness, contrast, saturation, hue, gamma)
+        x = img if tone is None else cv2.LUT(img, tone)
+        hsv = cv2.cvtColor(x, cv2.COLOR_BGR2HSV)
+        if hsv_lut is not None:
+            cv2.LUT(hsv, hsv_lut, dst=hsv)
+        x = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+        if gamma_lut is not None:
+            cv2.LUT(x, gamma_lut, dst=x)
+        return x
+
+    @staticmethod
+    def _adjust_reference(img, brightness=0, contrast=1.0, saturation=1.0, hue=0, gamma=1.0):
         x = img.astype(np.float32) / 255.0
         x = x * contrast + (brightness / 255.0)
         x = clamp01(x)
@@ -25,10 +204,7 @@ class Ops:
 
     @staticmethod
     def sepia(img, strength=0.8):
-        m = np.array([[0.272, 0.534, 0.131],
-                      [0.349, 0.686, 0.168],
-                      [0.393, 0.769, 0.189]], dtype=np.float32)
-        y = (img.astype(np.float32) @ m.T)
+        y = (img.astype(np.float32) @ SEPIA.T)
         y = np.clip(y, 0, 255).astype(np.uint8)
         return cv2.addWeighted(img, 1.0 - strength, y, strength, 0)
 
@@ -38,8 +214,8 @@ class Ops:
         return cv2.GaussianBlur(img, (k, k), 0)
 
     @staticmethod
-    def sharpen(img, amount=1.0):
-        blurred = cv2.GaussianBlur(img, (0, 0), 2.0)
+    def sharpen(img, amount=1.0, sigma=2.0):
+        blurred = cv2.GaussianBlur(img, (0, 0), sigma)
         return cv2.addWeighted(img, 1 + amount, blurred, -amount, 0)
 
     @staticmethod
@@ -51,33 +227,41 @@ class Ops:
     @staticmethod
     def cartoon(img, bilateral=9, edges_thresh=150):
         color = cv2.bilateralFilter(img, d=9, sigmaColor=bilateral, sigmaSpace=bilateral)
+        return cv2.bitwise_and(color, Ops.cartoon_edges(img, edges_thresh))
+
+    @staticmethod
+    def cartoon_edges(img, edges_thresh=150):
+        # inverted Canny mask; hysteresis makes it depend on the whole frame
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         e = cv2.Canny(gray, edges_thresh / 2, edges_thresh)
         e = cv2.bitwise_not(e)
-        e = cv2.cvtColor(e, cv2.COLOR_GRAY2BGR)
-        return cv2.bitwise_and(color, e)
+        return cv2.cvtColor(e, cv2.COLOR_GRAY2BGR)
 
     @staticmethod
     def vignette(img, strength=0.6):
         h, w = img.shape[:2]
-        y, x = np.ogrid[:h, :w]
-        cy, cx = h / 2, w / 2
-        r = np.sqrt((x - cx) ** 2 + (y - cy) ** 2)
-        max_r = np.sqrt(cx ** 2 + cy ** 2)
-        mask = 1 - strength * (r / max_r)
-        mask = np.clip(mask, 0, 1)
-        mask = np.dstack([mask] * 3)
-        out = img.astype(np.float32) * mask
-        return np.clip(out, 0, 255).astype(np.uint8)
+        mask = _vignette_mask(h, w, strength)
+        if img.ndim == 3:
+            mask = mask[..., None]
+        # mask is in [0, 1], so the product stays in 0..255 and needs no clip
+        return np.multiply(img, mask, dtype=np.float32).astype(np.uint8)
 
     @staticmethod
     def glow(img, amount=0.6, blur_ks=21):
         blur_ks = max(1, int(blur_ks) | 1)
-        blur = cv2.GaussianBlur(img, (blur_ks, blur_ks), 0)
+        if img.shape[0] * img.shape[1] <= GLOW_MEMO_PIXELS:
+            blur = _glow_blurs.get(img, blur_ks, lambda: _glow_blur(img, blur_ks))
+        else:
+            blur = _glow_blur(img, blur_ks)
         return cv2.addWeighted(img, 1.0, blur, amount, 0)
 
     @staticmethod
-    def blend(a, b, mode='normal', alpha=0.5):
+    def blend(a, b, mode='normal', alpha=0.5, out=None, scratch=None, linear=False):
+        # strip-mined engine in blend.py; bit-identical to _blend_reference for the original modes
+        return _blend.blend(a, b, mode=mode, alpha=alpha, out=out, scratch=scratch, linear=linear)
+
+    @staticmethod
+    def _blend_reference(a, b, mode='normal', alpha=0.5):
         if b is None:
             return a
         h, w = a.shape[:2]
@@ -107,11 +291,10 @@ class Ops:
 
     # --- New: Otsu mask + composite ---
     @staticmethod
-    def otsu_mask(img, invert=False, feather=0):
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        _, m = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        if invert:
-            m = 255 - m
+    def otsu_mask(img, invert=False, feather=0, threshold_from=None):
+        # threshold_from: image whose Otsu threshold applies, e.g. the full-res original of a proxy
+        t = otsu_threshold(img if threshold_from is None else threshold_from)
+        _, m = cv2.threshold(_gray(img), t, 255, cv2.THRESH_BINARY_INV if invert else cv2.THRESH_BINARY)
         if feather > 0:
             k = max(1, int(feather) | 1)
             m = cv2.GaussianBlur(m, (k, k), 0)
@@ -119,6 +302,22 @@ class Ops:
 
     @staticmethod
     def composite_by_mask(base, other, mask_u8):
+        h, w = base.shape[:2]
+        other = _blend.resized(other, w, h)
+        a = mask_u8[..., None] if base.ndim == 3 else mask_u8
+        # (base * (255 - a) + other * a) / 255 in uint16, truncated like the float version;
+        # (x + 1 + (x >> 8)) >> 8 == x // 255 for every x up to 255 * 255
+        num = np.multiply(base, 255 - a, dtype=np.uint16)
+        tmp = np.multiply(other, a, dtype=np.uint16)
+        num += tmp
+        np.right_shift(num, 8, out=tmp)
+        num += tmp
+        num += 1
+        num >>= 8
+        return num.astype(np.uint8)
+
+    @staticmethod
+    def _composite_by_mask_reference(base, other, mask_u8):
         h, w = base.shape[:2]
         other = cv2.resize(other, (w, h), interpolation=cv2.INTER_LINEAR)
         a = (mask_u8.astype(np.float32) / 255.0)[..., None]  # 0..1
@@ -126,7 +325,21 @@ class Ops:
         return np.clip(out, 0, 255).astype(np.uint8)
 
     @staticmethod
-    def reinhard_color_transfer(source, target):
+    def otsu_composite(base, other, invert=False, feather=0, threshold_from=None):
+        mask = Ops.otsu_mask(base, invert=invert, feather=feather, threshold_from=threshold_from)
+        return Ops.composite_by_mask(base, other, mask)
+
+    @staticmethod
+    def reinhard_color_transfer(source, target, strength=1.0, stats_from=None):
+        # stats_from: image whose statistics stand for source's, e.g. the full-res
+        # original when source is a preview proxy. strength mixes in BGR, so 0 is
+        # the untouched source rather than a LAB round trip.
+        if strength <= 0:
+            return source.copy()
+        return reinhard_apply(source, reinhard_lut(source if stats_from is None else stats_from, target), strength)
+
+    @staticmethod
+    def _reinhard_reference(source, target):
         src = cv2.cvtColor(source, cv2.COLOR_BGR2LAB).astype(np.float32)
         tgt = cv2.cvtColor(target, cv2.COLOR_BGR2LAB).astype(np.float32)
 
@@ -0,0 +1,191 @@
+import sys
+import time
+import tracemalloc
+import numpy as np
+import cv2
+from .ops import SEPIA, Ops, _glow_blur, _vignette_mask
+from .blend import KERNELS, STRIP_ELEMS, _thread_scratch, from_linear, resized, srgb_decode, srgb_encode, to_linear
+
+# working-buffer precisions: kernels compute in float32, float16 halves what is held between steps
+DTYPES = {"float32": np.float32, "float16": np.float16}
+
+
+def to_working(img, dtype="float32", linear=False):
+    """uint8 image -> working buffer in [0, 1], sRGB-encoded or in linear light."""
+    buf = to_linear(img) if linear else np.multiply(img, np.float32(1 / 255), dtype=np.float32)
+    return buf if DTYPES[dtype] is np.float32 else buf.astype(DTYPES[dtype])
+
+
+def to_uint8(buf, linear=False):
+    """Working buffer -> uint8: the chain's only clip and rounding."""
+    f = np.array(buf, np.float32)  # a copy, converted in place below
+    out = np.empty(f.shape, np.uint8)
+    if linear:
+        from_linear(f, out)
+        return out
+    f *= 255; np.clip(f, 0, 255, out=f); np.rint(f, out=f)
+    np.copyto(out, f, casting="unsafe")
+    return out
+
+
+# --- Strip kernels: fn(f, y0, y1) works in place on f, float32 rows y0:y1 of the buffer ---
+# Values may leave [0, 1] between steps; only blends clip their input (the modes are defined on [0, 1]).
+def _strip_kernel(op, extra, params, h, w, linear, state):
+    if op == "vignette":
+        mask = _vignette_mask(h, w, params.get("strength", 0.6))[..., None]
+        return lambda f, y0, y1: np.multiply(f, mask[y0:y1], out=f)
+    if op == "sepia":
+        s = params.get("strength", 0.8)
+
+        def sepia(f, y0, y1):
+            tone = cv2.transform(f, SEPIA).reshape(f.shape)
+            np.clip(tone, 0, 1, out=tone)
+            cv2.addWeighted(f, 1.0 - s, tone, s, 0, dst=f)
+        return sepia
+    if op == "glow":
+        amount = params.get("amount", 0.6)
+        blur = _glow_blur(state.astype(np.float32, copy=False), max(1, int(params.get("blur_ks", 21)) | 1)).reshape(h, w, -1)
+        return lambda f, y0, y1: cv2.scaleAdd(blur[y0:y1], amount, f, dst=f)
+    # blend
+    other = extra[0] if extra else None
+    if other is None:
+        return lambda f, y0, y1: None
+    b3 = resized(other, w, h).reshape(h, w, -1)
+    kernel = KERNELS.get(params.get("mode", "normal"), KERNELS["normal"])
+    alpha = params.get("alpha", 0.5)
+
+    def blend(f, y0, y1):
+        fb, t, u, m = _thread_scratch().views(f.shape)[1:]
+        np.clip(f, 0, 1, out=f)
+        if linear:
+            to_linear(b3[y0:y1], fb)
+        else:
+            np.multiply(b3[y0:y1], np.float32(1 / 255), out=fb, dtype=np.float32)
+        kernel(f, fb, alpha, t, u, m)
+    return blend
+
+
+FLOAT_KERNELS = ("vignette", "sepia", "glow", "blend")
+
+
+def fusable(op, params):
+    """True if op can share an sRGB working buffer; a linear-light blend keeps its own path."""
+    return op in FLOAT_KERNELS and not (op == "blend" and params.get("linear"))
+
+
+def _flush(img, buf, fns, store, linear):
+    # img or buf (the working buffer so far) through fns strip by strip, into a
+    # `store` buffer (buf itself when it has that dtype) or, for store=None, uint8
+    src = img if buf is None else buf
+    h, w = src.shape[:2]
+    if not fns:
+        if buf is None:
+            return img.copy() if store is None else to_working(img, np.dtype(store).name, linear)
+        return to_uint8(buf, linear) if store is None else buf
+    s3 = src.reshape(h, w, -1)
+    c = s3.shape[2]
+    out = np.empty(src.shape, store or np.uint8) if buf is None or buf.dtype != store else buf
+    o3 = out.reshape(h, w, -1)
+    rows = max(1, STRIP_ELEMS // (w * c))
+    f = np.empty((rows, w, c), np.float32)
+    for y in range(0, h, rows):
+        y1 = min(h, y + rows)
+        fs = f[:y1 - y]
+        if buf is not None:
+            np.copyto(fs, s3[y:y1])
+        elif linear:
+            to_linear(s3[y:y1], fs)
+        else:
+            np.multiply(s3[y:y1], np.float32(1 / 255), out=fs, dtype=np.float32)
+        for fn in fns:
+            fn(fs, y, y1)
+        if store is not None:
+            np.copyto(o3[y:y1], fs, casting="same_kind")
+        elif linear:
+            from_linear(fs, o3[y:y1])
+        else:
+            fs *= 255; np.clip(fs, 0, 255, out=fs); np.rint(fs, out=fs)
+            np.copyto(o3[y:y1], fs, casting="unsafe")
+    return out
+
+
+def run(img, steps, dtype="float32", linear=False):
+    """uint8 img through steps [(op, extra_images, params)], uint8 out, rounded once at the end.
+
+    Consecutive pointwise ops (vignette, sepia, blend) run fused, strip by
+    strip, in float32; the working buffer (`dtype`) is only materialized
+    where an op needs the whole image: before a glow (for its blur) and
+    around ops without a float kernel, which take a uint8 round-trip. With
+    linear=True the whole chain works in linear light, blends included.
+    """
+    store = DTYPES[dtype]
+    h, w = img.shape[:2]
+    buf, fns = None, []
+    for op, extra, params in steps:
+        if op == "glow" or op not in FLOAT_KERNELS:
+            buf, fns = _flush(img, buf, fns, store, linear), []
+            if op not in FLOAT_KERNELS:
+                buf = to_working(getattr(Ops, op)(to_uint8(buf, linear), *extra, **params), dtype, linear)
+                continue
+        fns.append(_strip_kernel(op, extra, params, h, w, linear, buf if op == "glow" else None))
+    return _flush(img, buf, fns, None, linear)
+
+
+# --- Benchmark: python -m artfusion.pipeline [MP ...] ---
+def _reference(img, steps, linear=False):
+    # the benchmark chain in float64, nothing rounded or clipped in between: the error baseline
+    x = img / 255.0
+    x = srgb_decode(x) if linear else x
+    for op, extra, p in steps:
+        if op == "glow":
+            x = x + p["amount"] * _glow_blur(x.astype(np.float32), 21)
+        elif op == "vignette":
+            x = x * _vignette_mask(x.shape[0], x.shape[1], p["strength"])[..., None]
+        elif op == "sepia":
+            x = x * (1 - p["strength"]) + np.clip(x @ SEPIA.T.astype(np.float64), 0, 1) * p["strength"]
+        elif op == "blend":  # normal mode
+            b = resized(extra[0], x.shape[1], x.shape[0]) / 255.0
+            x = np.clip(x, 0, 1) * (1 - p["alpha"]) + (srgb_decode(b) if linear else b) * p["alpha"]
+    x = np.clip(x, 0, 1)
+    return (srgb_encode(x) if linear else x) * 255
+
+
+def benchmark(megapixels=(8, 24), repeat=3):
+    """One glow > vignette > sepia > blend chain: per-op uint8 vs float32 / float16 buffers vs linear light.
+
+    Reports the best time, the peak of memory allocated while the chain runs
+    and the error against the same chain computed in float64.
+    """
+    rows = []
+    for mp in megapixels:
+        w = int((mp * 1e6 * 3 / 2) ** 0.5); h = int(mp * 1e6 / w)
+        img = cv2.GaussianBlur(np.random.default_rng(0).integers(0, 256, (h, w, 3), dtype=np.uint8), (0, 0), 3)
+        other = np.ascontiguousarray(img[::-1, ::-1])
+        steps = [("glow", (), {"amount": 0.5}), ("vignette", (), {"strength": 0.6}),
+                 ("sepia", (), {"strength": 0.4}), ("blend", (other,), {"mode": "normal", "alpha": 0.3})]
+
+        def per_op():
+            out = img
+            for op, extra, p in steps:
+                out = getattr(Ops, op)(out, *extra, **p)
+            return out
+
+        refs = {lin: _reference(img, steps, lin) for lin in (False, True)}
+        for name, fn, lin in [("uint8 per op", per_op, False),
+                              ("float32", lambda: run(img, steps, "float32"), False),
+                              ("float16", lambda: run(img, steps, "float16"), False),
+                              ("float32 linear", lambda: run(img, steps, "float32", linear=True), True)]:
+            ts = []
+            for _ in range(repeat):
+                t0 = time.perf_counter(); out = fn(); ts.append(time.perf_counter() - t0)
+            tracemalloc.start(); fn(); peak = tracemalloc.get_traced_memory()[1]; tracemalloc.stop()
+            err = np.abs(out - refs[lin])
+            rows.append({"mode": name, "mp": mp, "s": min(ts), "peak_mb": peak / 2**20,
+                         "max_err": float(err.max()), "mean_err": float(err.mean())})
+            print(f"{name:16s} {mp:4d} MP  {min(ts) * 1000:8.1f} ms  peak {peak / 2**20:6.0f} MB  "
+                  f"error vs float64: max {err.max():5.2f}  mean {err.mean():.3f}")
+    return rows
+
+
+if __name__ == "__main__":
+    benchmark([int(a) for a in sys.argv[1:]] or (8, 24))
\ No newline at end of file
@@ -0,0 +1,243 @@
+import atexit
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor
+import numpy as np
+import cv2
+from .ops import Ops, reinhard_apply, reinhard_lut
+from .tiles import HALOS, TiledExecutor
+from .blend import resized
+from .instrument import span
+
+# ARTFUSION_BACKEND=process runs full-resolution applies as row bands in worker
+# processes; "thread" (default) keeps them in-process on TiledExecutor threads
+BACKEND = os.environ.get("ARTFUSION_BACKEND", "thread")
+MIN_PIXELS = 2_000_000  # below this, copying into shared memory costs more than the cores win back
+
+
+class SharedImage:
+    """A NumPy array living in a multiprocessing.shared_memory block.
+
+    Pickling sends only (name, shape, dtype); unpickling in a worker attaches
+    to the same block, so pixels never go through the pipe. The creating
+    process owns the block and must unlink() it.
+    """
+
+    def __init__(self, shape, dtype, name=None):
+        from multiprocessing import shared_memory
+        dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(shape)) * dtype.itemsize)
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size if name is None else 0)
+        self.array = np.ndarray(shape, dtype, buffer=self.shm.buf)
+        self.spec = (self.shm.name, tuple(shape), dtype.str)
+        if name is None:
+            _live.add(self)
+
+    @classmethod
+    def copy_of(cls, img):
+        s = cls(img.shape, img.dtype)
+        s.array[...] = img
+        return s
+
+    @classmethod
+    def attach(cls, spec):
+        name, shape, dtype = spec
+        return cls(shape, dtype, name=name)
+
+    def __reduce__(self):
+        return SharedImage.attach, (self.spec,)
+
+    def close(self):
+        self.array = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # a view is still alive (e.g. held by a traceback); the mapping goes with it
+
+    def unlink(self):
+        _live.discard(self)
+        self.close()
+        self.shm.unlink()
+
+
+_live = set()  # blocks this process created and has not unlinked yet
+
+
+# --- Shared pool: started on first use, reused by GUI applies and batch runs ---
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    cv2.setNumThreads(1)  # parallelism comes from the processes
+
+
+def get_pool(workers=None):
+    """The process pool, (re)started with `workers` processes (default: CPU count)."""
+    global _pool, _pool_workers
+    from concurrent.futures import ProcessPoolExecutor  # loads multiprocessing's pool machinery
+    from multiprocessing import get_context
+    workers = workers or os.cpu_count() or 1
+    with _pool_lock:
+        if _pool is not None and (_pool_workers != workers or getattr(_pool, "_broken", False)):
+            _pool.shutdown(wait=True)
+            _pool = None
+        if _pool is None:
+            # spawn: forking a process that runs Qt and worker threads is not safe
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                                        initializer=_init_worker)
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+    for s in list(_live):
+        try:
+            s.unlink()
+        except (BufferError, FileNotFoundError):
+            pass
+
+
+atexit.register(shutdown)
+
+
+def _band(fn, img, args, kwargs, out, y0, y1, y, yend):
+    # worker side: fn on rows y0:y1 (band plus halo) of every shared input; rows y:yend go to out
+    try:
+        rows = [a.array[y0:y1] if isinstance(a, SharedImage) else a for a in (img,) + args]
+        res = fn(*rows, **kwargs)
+        out.array[y:yend] = res[y - y0:yend - y0]
+        del rows, res
+    finally:
+        for a in (img, out) + args:
+            if isinstance(a, SharedImage):
+                a.close()
+
+
+class ProcessExecutor(TiledExecutor):
+    """TiledExecutor whose tileable ops (and Reinhard) run as row bands in the shared process pool.
+
+    Inputs are copied once into shared memory, each worker computes its band
+    plus the op's halo and writes the band straight into a shared output, so
+    results are identical to the in-process call. Small images, untileable ops
+    and a broken pool fall back to the thread tiles.
+    """
+
+    def __init__(self, workers=None, min_pixels=MIN_PIXELS, ops=None):
+        super().__init__(workers=workers, ops=ops)
+        self.min_pixels = min_pixels
+
+    def apply(self, name, img, *args, **params):
+        if self.workers == 1 or img.shape[0] * img.shape[1] < self.min_pixels:
+            return super().apply(name, img, *args, **params)
+        try:
+            if name == "reinhard_color_transfer":
+                return self._reinhard(img, *args, **params)
+            halo = HALOS[name](**params) if name in self.ops else None
+            if halo is None:
+                return super().apply(name, img, *args, **params)
+            if name == "cartoon":
+                bilateral = params.get("bilateral", 9)
+                color = self.bands(cv2.bilateralFilter, img, halo, d=9, sigmaColor=bilateral, sigmaSpace=bilateral)
+                return cv2.bitwise_and(color, Ops.cartoon_edges(img, params.get("edges_thresh", 150)))
+            if name in ("blend", "composite_by_mask") and args and args[0] is not None:
+                h, w = img.shape[:2]
+                args = (resized(args[0], w, h),) + args[1:]
+            return self.bands(getattr(Ops, name), img, halo, *args, **params)
+        except BrokenExecutor:
+            shutdown()  # a worker died; the next call starts a fresh pool
+            return super().apply(name, img, *args, **params)
+
+    def _reinhard(self, img, target, strength=1.0, stats_from=None):
+        # statistics are global (and memoized here); the LUT pass is per pixel
+        if strength <= 0:
+            return img.copy()
+        lut = reinhard_lut(img if stats_from is None else stats_from, target)
+        return self.bands(reinhard_apply, img, 0, lut, strength=strength)
+
+    def bands(self, fn, img, halo, *args, **kwargs):
+        """fn(img, *args, **kwargs) in horizontal bands; array args of img's size are split alongside it."""
+        h = img.shape[0]
+        pool = get_pool(self.workers)
+        step = -(-h // self.workers)
+        blocks = []
+        try:
+            with span("to_shared", "convert"):
+                src = SharedImage.copy_of(img); blocks.append(src)
+                shared = []
+                for a in args:
+                    if isinstance(a, np.ndarray) and a.shape[:2] == img.shape[:2]:
+                        a = SharedImage.copy_of(a); blocks.append(a)
+                    shared.append(a)
+                out = SharedImage(img.shape, img.dtype); blocks.append(out)
+            with span(getattr(fn, "__name__", "bands"), "compute", bands=self.workers):
+                futures = [pool.submit(_band, fn, src, tuple(shared), kwargs, out,
+                                       max(0, y - halo), min(h, y + step + halo), y, min(h, y + step))
+                           for y in range(0, h, step)]
+                for f in futures:
+                    f.result()
+            with span("from_shared", "convert"):
+                return out.array.copy()
+        finally:
+            for b in blocks:
+                b.unlink()
+
+
+def make_executor(backend=None):
+    """Executor for full-resolution applies: "thread" tiles or "process" bands (ARTFUSION_BACKEND)."""
+    backend = backend or BACKEND
+    if backend == "process":
+        return ProcessExecutor()
+    if backend == "thread":
+        return TiledExecutor()
+    raise ValueError(f"unknown backend '{backend}' (choose from thread, process)")
+
+
+# --- Benchmark: python -m artfusion.procpool [MP ...] ---
+def benchmark(megapixels=(8, 24, 50), repeat=3, workers=None, ops=None):
+    """In-process Ops vs thread tiles vs process bands; the process time includes shared-memory copies."""
+    workers = workers or max(2, os.cpu_count() or 1)
+    threads, procs = TiledExecutor(workers=workers), ProcessExecutor(workers=workers, min_pixels=0)
+    params = {
+        "cartoon": {"bilateral": 20}, "reinhard_color_transfer": {}, "blend": {"mode": "soft light"},
+        "blur": {"k": 31}, "sepia": {"strength": 0.8},
+    }
+    get_pool(workers).submit(int).result()  # pool start-up is a one-off cost, keep it out of the timings
+    rows = []
+    for mp in megapixels:
+        w = int((mp * 1e6 * 3 / 2) ** 0.5); h = int(mp * 1e6 / w)
+        img = cv2.GaussianBlur(np.random.default_rng(0).integers(0, 256, (h, w, 3), dtype=np.uint8), (0, 0), 3)
+        other = np.ascontiguousarray(img[::-1, ::-1])
+        for name in ops or params:
+            p = params[name]
+            args = (other,) if name in ("blend", "reinhard_color_transfer") else ()
+            fn = getattr(Ops, name)
+
+            def best(f):
+                ts = []
+                for _ in range(repeat):
+                    t0 = time.perf_counter(); r = f(); ts.append(time.perf_counter() - t0)
+                return min(ts), r
+
+            t_ref, ref = best(lambda: fn(img, *args, **p))
+            t_thr, _ = best(lambda: threads.apply(name, img, *args, **p))
+            t_proc, res = best(lambda: procs.apply(name, img, *args, **p))
+            rows.append({"op": name, "mp": mp, "workers": workers, "in_process_s": t_ref, "threads_s": t_thr,
+                         "processes_s": t_proc, "speedup": t_ref / t_proc,
+                         "identical": bool(np.array_equal(ref, res))})
+            print(f"{name:24s} {mp:4d} MP  in-process {t_ref * 1000:8.1f} ms  threads {t_thr * 1000:8.1f} ms  "
+                  f"processes {t_proc * 1000:8.1f} ms  x{t_ref / t_proc:4.1f}  identical={rows[-1]['identical']}")
+    threads.close(); procs.close()
+    return rows
+
+
+if __name__ == "__main__":
+    import sys
+    benchmark([int(a) for a in sys.argv[1:]] or (8, 24, 50))
\ No newline at end of file
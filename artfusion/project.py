@@ -0,0 +1,263 @@
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .cache import fingerprint
+from .history import _Entry
+from .recipe import Recipe
+from .instrument import count, span
+
+VERSION = 1
+MANIFEST = "manifest.json"
+CHUNKS = "chunks"
+
+
+class ProjectWriter:
+    """Writes session states into a project directory.
+
+    Arrays (images, bases, sources) are .npy chunks, memory-mapped back on
+    open; each undo/redo entry is one .pack chunk holding its tiles back to
+    back, zlib payloads as they are and tiles the history has not compressed
+    yet raw (the next save after compression rewrites the entry smaller).
+    Chunks are named by their content, so a save writes only those not on
+    disk yet, replaces manifest.json atomically, then deletes the chunks it
+    referenced before and no longer does (never another writer's). save_async()
+    runs on one background thread; states submitted meanwhile are merged, the
+    latest wins.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.saves = self.chunks_written = 0
+        self._names = {}  # id(obj) -> (obj, chunk name, tile spans or None) for the last saved state
+        self._last = None  # manifest text last written
+        self._lock = threading.Lock()
+        self._next = None  # (state, callbacks) waiting for the writer thread
+        self._busy = False
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="project")
+
+    def remember(self, state):
+        """Chunk names of a state loaded from this directory, so saving it again hashes nothing."""
+        for obj, name, spans in state.get("chunks", ()):
+            self._names[id(obj)] = (obj, name, spans)
+
+    @property
+    def idle(self):
+        with self._lock:
+            return not self._busy
+
+    def save_async(self, state, on_done=None):
+        """Save state on the writer thread; on_done(error or None) is called there when it is on disk."""
+        with self._lock:
+            callbacks = self._next[1] if self._next else []
+            self._next = (state, callbacks + [on_done] if on_done else callbacks)
+            if self._busy:
+                return
+            self._busy = True
+        try:
+            self._pool.submit(self._drain)
+        except RuntimeError:  # closed
+            with self._lock:
+                self._busy = False
+
+    def wait(self):
+        self._pool.submit(lambda: None).result()
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def _drain(self):
+        finished = False
+        try:
+            while True:
+                with self._lock:
+                    job, self._next = self._next, None
+                    if job is None:
+                        self._busy, finished = False, True
+                        return
+                state, callbacks = job
+                error = None
+                try:
+                    self.save(state)
+                except Exception as e:  # reported to the callbacks; the writer keeps serving saves
+                    error = e
+                for cb in callbacks:
+                    cb(error)
+        finally:
+            if not finished:  # a callback raised: let the next save_async start the writer again
+                with self._lock:
+                    self._busy = False
+
+    def save(self, state):
+        """Write state now; False if nothing changed since the last save."""
+        with span("project.save", "io"):
+            chunks = os.path.join(self.path, CHUNKS)
+            os.makedirs(chunks, exist_ok=True)
+            names = {}
+
+            def known(obj):
+                # name saved last time for this very object, if its file is still there
+                hit = self._names.get(id(obj))
+                if hit is not None and hit[0] is obj and os.path.exists(os.path.join(chunks, hit[1])):
+                    return hit
+                return None
+
+            def write(name, parts):
+                path = os.path.join(chunks, name)
+                if os.path.exists(path):
+                    return
+                tmp = path + ".tmp"
+                with open(tmp, "wb") as f:
+                    for p in parts:
+                        if isinstance(p, np.ndarray):
+                            np.save(f, np.ascontiguousarray(p))
+                        else:
+                            f.write(p)  # bytes or a buffer
+                os.replace(tmp, path)
+                self.chunks_written += 1
+                count("project.chunks_written")
+
+            def put(obj):
+                if obj is None:
+                    return None
+                hit = known(obj)
+                if hit is not None:
+                    name = hit[1]
+                else:
+                    name = fingerprint(obj) + ".npy"
+                    write(name, [obj])
+                names[id(obj)] = (obj, name, None)
+                return name
+
+            def entry(e):
+                tiles = e.tiles  # read once: the history compressor swaps the list, never edits it
+                hit = known(tiles)
+                if hit is not None:
+                    _, name, spans = hit
+                else:
+                    payloads = [np.ascontiguousarray(p).data if isinstance(p, np.ndarray) else p
+                                for _, _, _, p in tiles]
+                    h = hashlib.blake2b(digest_size=16)
+                    spans, offset = [], 0
+                    for (*_, p), data in zip(tiles, payloads):
+                        h.update(data)
+                        spans.append((offset, data.nbytes if isinstance(data, memoryview) else len(data),
+                                      not isinstance(p, np.ndarray)))
+                        offset += spans[-1][1]
+                    name = h.hexdigest() + ".pack" if payloads else None
+                    if name is not None:
+                        write(name, payloads)
+                if name is not None:
+                    names[id(tiles)] = (tiles, name, spans)
+                return {"shape": list(e.shape), "dtype": np.dtype(e.dtype).str, "full": e.full, "seq": e.seq,
+                        "meta": e.meta, "pack": name,
+                        "tiles": [[y, x, list(shape), off, n, z] for (y, x, shape, _), (off, n, z) in zip(tiles, spans)]}
+
+            # only sources a head or an undo/redo state can reach: older ones are never replayed
+            refs = state["recipe"]["heads"] + [e.meta for undo, redo in state["history"] for e in undo + redo]
+            reachable = Recipe.from_dict(state["recipe"]).sources_of(refs)
+            manifest = {
+                "version": VERSION,
+                "active": state["active"],
+                "images": [put(a) for a in state["images"]],
+                "bases": [put(a) for a in state["bases"]],
+                "sources": {sid: put(a) for sid, a in state["sources"].items() if sid in reachable},
+                "recipe": state["recipe"],
+                "history": [{"undo": [entry(e) for e in undo], "redo": [entry(e) for e in redo]}
+                            for undo, redo in state["history"]],
+                "ui": state["ui"],
+            }
+            dropped = {n for _, n, _ in self._names.values()} - {n for _, n, _ in names.values()}
+            self._names = names
+            text = json.dumps(manifest, indent=1, ensure_ascii=False)
+            if text == self._last:
+                return False
+            tmp = os.path.join(self.path, MANIFEST + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, os.path.join(self.path, MANIFEST))
+            self._last = text
+            self.saves += 1
+            for name in dropped:
+                try:
+                    os.remove(os.path.join(chunks, name))
+                except OSError:
+                    pass  # gone already, or still mapped (Windows)
+            return True
+
+
+def exists(path):
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def load(path):
+    """Session state saved in a project directory.
+
+    Every chunk is memory-mapped read-only, so opening reads the manifest only
+    and pixels are paged in when first used. Returns the dict save() takes,
+    with a Recipe, History entries and `chunks` [(object, name, spans)] added.
+    """
+    with span("project.load", "io"):
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            m = json.load(f)
+        if m.get("version") != VERSION:
+            raise ValueError(f"unsupported project version {m.get('version')}")
+        chunks = os.path.join(path, CHUNKS)
+        loaded = {}
+
+        def get(name):
+            if name is None:
+                return None
+            if name not in loaded:
+                loaded[name] = (np.load(os.path.join(chunks, name), mmap_mode="r").view(np.ndarray), name, None)
+            return loaded[name][0]
+
+        def entry(d):
+            tiles = []
+            if d["pack"] is not None:
+                with open(os.path.join(chunks, d["pack"]), "rb") as f:
+                    view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                dtype = np.dtype(d["dtype"])
+                # zlib tiles stay views into the file; raw ones become read-only arrays over it
+                tiles = [(y, x, tuple(shape), view[off:off + n] if z else
+                          np.frombuffer(view[off:off + n], dtype).reshape(shape)) for y, x, shape, off, n, z in d["tiles"]]
+                loaded[d["pack"]] = (tiles, d["pack"], [(off, n, z) for *_, off, n, z in d["tiles"]])
+            return _Entry(tuple(d["shape"]), np.dtype(d["dtype"]), d["full"], tiles, d["seq"], d["meta"])
+
+        recipe = Recipe.from_dict(m["recipe"])
+        sources = {sid: get(name) for sid, name in m["sources"].items()}
+        for sid, img in sources.items():
+            recipe.set_source_image(sid, img)
+        return {
+            "active": m["active"],
+            "images": [get(n) for n in m["images"]],
+            "bases": [get(n) for n in m["bases"]],
+            "sources": sources,
+            "recipe": recipe,
+            "history": [([entry(e) for e in h["undo"]], [entry(e) for e in h["redo"]]) for h in m["history"]],
+            "ui": m.get("ui", {}),
+            "chunks": list(loaded.values()),
+        }
+
+
+def rotate(path):
+    """Move the autosave at path aside (replacing the older one) and return where it went, or None."""
+    if not exists(path):
+        return None
+    prev = path.rstrip("/\\") + ".prev"
+    shutil.rmtree(prev, ignore_errors=True)
+    if os.path.exists(prev):
+        return None  # the old one is still in use (mapped on Windows); keep writing over path
+    os.replace(path, prev)
+    return prev
+
+
+def reclaim(prev, path):
+    """Move a rotated autosave back to path (replacing what is there) and return path."""
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(prev, path)
+    return path
\ No newline at end of file
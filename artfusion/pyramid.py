@@ -0,0 +1,46 @@
+import threading
+import cv2
+
+
+class Pyramid:
+    """Downsampled copies of an image (1/2, 1/4, ...) built on first use.
+
+    Safe to share between threads: levels are built under a lock, so a level
+    needed by the GUI and a preview worker at once is appended only once.
+    """
+
+    def __init__(self, img, levels=3):
+        self.levels = [img]
+        self.max_levels = levels
+        self._lock = threading.Lock()
+
+    @property
+    def base(self):
+        return self.levels[0]
+
+    def level(self, i):
+        i = max(0, min(int(i), self.max_levels))
+        if i < len(self.levels):
+            return self.levels[i]  # built levels never change: no lock needed to read them
+        with self._lock:
+            while len(self.levels) <= i:
+                prev = self.levels[-1]
+                h, w = prev.shape[:2]
+                if w < 2 or h < 2:
+                    return prev
+                size = ((w + 1) // 2, (h + 1) // 2)
+                lvl = cv2.resize(prev, size, interpolation=cv2.INTER_AREA)
+                lvl.setflags(write=False)  # shared with preview workers; also lets per-image memos apply
+                self.levels.append(lvl)
+            return self.levels[i]
+
+    def level_for(self, width, height):
+        # coarsest level that still covers (width, height) on screen
+        h, w = self.base.shape[:2]
+        i = 0
+        while i < self.max_levels and (w >> (i + 1)) >= width and (h >> (i + 1)) >= height:
+            i += 1
+        return i
+
+    def for_size(self, width, height):
+        return self.level(self.level_for(width, height))
\ No newline at end of file
@@ -0,0 +1,301 @@
+import ast
+import json
+import os
+from collections import OrderedDict
+from .ops import Ops
+from .utils import load_image
+from . import pipeline
+
+# op name -> number of image inputs; each op is the Ops static method of that name
+OPS = {
+    "adjust": 1,
+    "grayscale": 1,
+    "sepia": 1,
+    "blur": 1,
+    "sharpen": 1,
+    "edges": 1,
+    "cartoon": 1,
+    "vignette": 1,
+    "glow": 1,
+    "blend": 2,
+    "reinhard_color_transfer": 2,
+    "otsu_composite": 2,
+}
+
+
+def parse_params(text):
+    """'key=value, key=value' -> dict; values are Python literals, else strings."""
+    params = {}
+    for item in filter(None, (p.strip() for p in text.split(","))):
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"expected key=value, got '{item}'")
+        try:
+            params[key.strip()] = ast.literal_eval(value.strip())
+        except (ValueError, SyntaxError):
+            params[key.strip()] = value.strip()
+    return params
+
+
+def format_params(params):
+    return ", ".join(f"{k}={v!r}" for k, v in params.items())
+
+
+def _call(name, *imgs, **params):
+    return getattr(Ops, name)(*imgs, **params)
+
+
+class Node:
+    __slots__ = ("id", "op", "inputs", "params", "chained")
+
+    def __init__(self, id, op, inputs, params, chained=False):
+        self.id, self.op, self.inputs, self.params = id, op, list(inputs), dict(params)
+        self.chained = chained  # added with its first input in one edit: may share its working buffer
+
+    def to_dict(self):
+        d = {"id": self.id, "op": self.op, "inputs": self.inputs, "params": self.params}
+        if self.chained:
+            d["chained"] = True
+        return d
+
+
+class Recipe:
+    """Non-destructive edit graph: sources ("s0", ...) feed op nodes ("n0", ...).
+
+    heads[slot] is the node (or source) currently shown in each slot. Node
+    outputs are cached under a byte budget; changing a node's params or a
+    source image only invalidates what lies downstream of it.
+
+    With precision "float32" or "float16", a run of chained nodes that have a
+    float kernel (see pipeline.fusable) is computed in one pass on a working
+    buffer of that precision, rounded to uint8 once at its end. A run is
+    always recomputed from its start, so its output does not depend on what
+    happens to be cached.
+    """
+
+    VERSION = 1
+
+    def __init__(self, cache_bytes=256 * 1024 * 1024, precision="uint8"):
+        if precision != "uint8" and precision not in pipeline.DTYPES:
+            raise ValueError(f"unknown precision '{precision}' (choose from uint8, {', '.join(pipeline.DTYPES)})")
+        self.precision = precision
+        self.sources = {}   # id -> path (or None)
+        self.nodes = {}     # id -> Node; insertion order is a topological order
+        self.heads = [None, None]
+        self.cache_bytes = cache_bytes
+        self._images = {}   # source id -> decoded image
+        self._cache = OrderedDict()  # node id -> output, least recently used first
+        self._next = 0
+
+    def _new_id(self, prefix):
+        self._next += 1
+        return f"{prefix}{self._next - 1}"
+
+    # --- building ---
+    def add_source(self, img=None, path=None):
+        sid = self._new_id("s")
+        self.sources[sid] = path
+        if img is not None:
+            self._images[sid] = img
+        return sid
+
+    def add(self, op, inputs, params=None, chained=False):
+        if op not in OPS:
+            raise ValueError(f"unknown op '{op}'")
+        if len(inputs) != OPS[op]:
+            raise ValueError(f"'{op}' takes {OPS[op]} input(s), got {len(inputs)}")
+        for ref in inputs:
+            if ref not in self.nodes and ref not in self.sources:
+                raise KeyError(ref)
+        nid = self._new_id("n")
+        self.nodes[nid] = Node(nid, op, inputs, params or {}, chained)
+        return nid
+
+    def set_params(self, nid, **params):
+        self.nodes[nid].params = dict(params)
+        self.invalidate(nid)
+
+    def retune(self, head, nid, **params):
+        """New head equal to `head` but with node nid's params replaced.
+
+        nid must lie on head's chain. Nodes from nid down to head are copied, so
+        earlier heads (e.g. in undo history) keep their meaning, and everything
+        upstream of nid is shared and stays cached.
+        """
+        chain = self.chain(head)
+        prev = self.nodes[nid].inputs[0]
+        for cid in chain[chain.index(nid):]:
+            node = self.nodes[cid]
+            prev = self.add(node.op, [prev] + node.inputs[1:], params if cid == nid else node.params, node.chained)
+        return prev
+
+    def set_source_image(self, sid, img):
+        self._images[sid] = img
+        self.invalidate(sid)
+
+    def source_images(self, refs=None):
+        """{source id: image} for the sources held in memory (only those refs depend on, if given)."""
+        keep = None if refs is None else self.sources_of(refs)
+        return {sid: img for sid, img in self._images.items() if img is not None and (keep is None or sid in keep)}
+
+    def release(self, refs):
+        """Drop the decoded images of sources none of refs depends on; a path source reloads if needed."""
+        keep = self.sources_of(refs)
+        for sid in [sid for sid in self._images if sid not in keep]:
+            del self._images[sid]
+
+    # --- graph queries ---
+    def downstream(self, ref):
+        out = set()
+        for nid, node in self.nodes.items():  # topological order: one pass is enough
+            if ref in node.inputs or out.intersection(node.inputs):
+                out.add(nid)
+        return out
+
+    def sources_of(self, refs):
+        """Source ids any of refs depends on (None entries are skipped)."""
+        out, seen, stack = set(), set(), [r for r in refs if r is not None]
+        while stack:
+            r = stack.pop()
+            if r in seen:
+                continue
+            seen.add(r)
+            if r in self.sources:
+                out.add(r)
+            elif r in self.nodes:
+                stack.extend(self.nodes[r].inputs)
+        return out
+
+    def chain(self, ref):
+        """Node ids from the root source to ref, following each node's first input."""
+        ids = []
+        while ref in self.nodes:
+            ids.append(ref)
+            ref = self.nodes[ref].inputs[0]
+        return ids[::-1]
+
+    def root(self, ref):
+        while ref in self.nodes:
+            ref = self.nodes[ref].inputs[0]
+        return ref
+
+    def fused_run(self, nid):
+        """Node ids computed together with nid, which ends the run ([nid] when it is not fused)."""
+        ids = [nid]
+        if self.precision == "uint8":
+            return ids
+        node = self.nodes[nid]
+        while node.chained and pipeline.fusable(node.op, node.params):
+            prev = self.nodes.get(node.inputs[0])
+            if prev is None or not pipeline.fusable(prev.op, prev.params):
+                break
+            ids.append(prev.id)
+            node = prev
+        return ids[::-1] if len(ids) > 1 else [nid]
+
+    # --- evaluation ---
+    def invalidate(self, ref):
+        for nid in self.downstream(ref) | {ref}:
+            self._cache.pop(nid, None)
+
+    def store(self, nid, img):
+        """Seed the cache with an output computed elsewhere."""
+        self._cache[nid] = img
+        self._cache.move_to_end(nid)
+        self._trim(keep=nid)
+
+    def _source(self, sid):
+        img = self._images.get(sid)
+        if img is None:
+            path = self.sources.get(sid)
+            img = load_image(path) if path else None
+            if img is None:
+                raise ValueError(f"source {sid} has no image (path: {path})")
+            self._images[sid] = img
+        return img
+
+    def evaluate(self, ref, apply=None):
+        """Output of ref; apply(op, *imgs, **params) runs an op (default: Ops directly)."""
+        apply = apply or _call
+        # collect the uncached ancestors, then run them in topological order
+        local, need, stack = {}, set(), [ref]
+        while stack:
+            r = stack.pop()
+            if r in need or r in local:
+                continue
+            if r in self.sources:
+                local[r] = self._source(r)
+            elif r in self._cache:
+                self._cache.move_to_end(r)
+                local[r] = self._cache[r]  # held here in case trimming evicts it mid-run
+            else:
+                need.add(r)
+                run = [self.nodes[i] for i in self.fused_run(r)]
+                stack.append(run[0].inputs[0])
+                stack.extend(i for n in run for i in n.inputs[1:])
+        for nid in self.nodes:
+            if nid in need:
+                run = [self.nodes[i] for i in self.fused_run(nid)]
+                if len(run) > 1:
+                    steps = [(n.op, tuple(local[i] for i in n.inputs[1:]), n.params) for n in run]
+                    local[nid] = pipeline.run(local[run[0].inputs[0]], steps, self.precision)
+                else:
+                    node = run[0]
+                    local[nid] = apply(node.op, *(local[r] for r in node.inputs), **node.params)
+                self.store(nid, local[nid])
+        return local[ref]
+
+    def run(self, apply=None):
+        """Evaluate both heads at full resolution (headless replay)."""
+        return [None if h is None else self.evaluate(h, apply) for h in self.heads]
+
+    def cache_nbytes(self):
+        return sum(a.nbytes for a in self._cache.values())
+
+    def _trim(self, keep):
+        total = self.cache_nbytes()
+        for nid in list(self._cache):
+            if total <= self.cache_bytes:
+                break
+            if nid != keep:
+                total -= self._cache.pop(nid).nbytes
+
+    # --- persistence ---
+    def to_dict(self):
+        d = {
+            "version": self.VERSION,
+            "sources": [{"id": sid, "path": p} for sid, p in self.sources.items()],
+            "nodes": [n.to_dict() for n in self.nodes.values()],
+            "heads": list(self.heads),
+        }
+        if self.precision != "uint8":
+            d["precision"] = self.precision
+        return d
+
+    @classmethod
+    def from_dict(cls, data, base_dir=None):
+        if data.get("version") != cls.VERSION:
+            raise ValueError(f"unsupported recipe version {data.get('version')}")
+        r = cls(precision=data.get("precision", "uint8"))
+        for s in data["sources"]:
+            path = s.get("path")
+            if path and base_dir and not os.path.isabs(path):
+                path = os.path.join(base_dir, path)
+            r.sources[s["id"]] = path
+        for n in data["nodes"]:
+            if n["op"] not in OPS:
+                raise ValueError(f"unknown op '{n['op']}'")
+            r.nodes[n["id"]] = Node(n["id"], n["op"], n["inputs"], n.get("params", {}), n.get("chained", False))
+        r.heads = list(data.get("heads", [None, None]))
+        ids = [int(i[1:]) for i in list(r.sources) + list(r.nodes) if i[1:].isdigit()]
+        r._next = max(ids, default=-1) + 1
+        return r
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f), base_dir=os.path.dirname(os.path.abspath(path)))
\ No newline at end of file
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import time
+import traceback
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+from .instrument import count, span
+
+
+class _RenderJob(QRunnable):
+    def __init__(self, renderer, gen, slot, fn, args, kwargs, t0):
+        super().__init__()
+        self.renderer = renderer
+        self.gen, self.slot, self.t0 = gen, slot, t0
+        self.fn, self.args, self.kwargs = fn, args, kwargs
+
+    def run(self):
+        out = error = None
+        try:
+            with span("preview", "compute"):
+                out = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            traceback.print_exc()  # a bug in preview code, not a dropped frame
+            error = f"{type(e).__name__}: {e}"
+        self.renderer._done.emit(self.gen, self.slot, out, self.t0, error)
+
+
+class PreviewRenderer(QObject):
+    """Renders live previews off the GUI thread, keeping only the latest request.
+
+    At most one job runs at a time; a request arriving while it runs replaces
+    any pending one, and results of superseded jobs are discarded. A job that
+    raises is counted in `errors` (not `dropped`) and reported by `failed`.
+    """
+
+    ready = Signal(int, object)  # slot, image
+    failed = Signal(int, str)  # slot, error message
+    _done = Signal(int, int, object, float, object)
+
+    def __init__(self, parent=None, target_ms=50.0):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.target_ms = target_ms
+        self._gen = 0
+        self._busy = False
+        self._pending = None
+        self._done.connect(self._on_done)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.requested = 0
+        self.rendered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.late = 0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self._total_ms = 0.0
+
+    def request(self, slot, fn, *args, **kwargs):
+        self.requested += 1
+        count("preview.requested")
+        self._gen += 1
+        job = (self._gen, slot, fn, args, kwargs, time.perf_counter())
+        if self._busy:
+            if self._pending is not None:
+                self.dropped += 1
+                count("preview.dropped")
+            self._pending = job
+        else:
+            self._start(job)
+
+    def cancel(self):
+        # invalidate whatever is queued or running, e.g. when an edit is committed
+        self._gen += 1
+        if self._pending is not None:
+            self.dropped += 1
+            count("preview.dropped")
+            self._pending = None
+
+    def _start(self, job):
+        self._busy = True
+        self.pool.start(_RenderJob(self, *job[:5], job[5]))
+
+    def _on_done(self, gen, slot, out, t0, error):
+        self._busy = False
+        if error is not None:
+            self.errors += 1
+            count("preview.errors")
+            self.failed.emit(slot, error)
+        elif gen == self._gen and out is not None:
+            ms = (time.perf_counter() - t0) * 1000.0
+            self.rendered += 1
+            count("preview.rendered")
+            self.last_ms = ms
+            self.max_ms = max(self.max_ms, ms)
+            self._total_ms += ms
+            if ms > self.target_ms:
+                self.late += 1
+                count("preview.late")
+            self.ready.emit(slot, out)
+        else:
+            self.dropped += 1
+            count("preview.dropped")
+        if self._pending is not None:
+            job, self._pending = self._pending, None
+            self._start(job)
+
+    def stats(self):
+        return {
+            "requested": self.requested,
+            "rendered": self.rendered,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "late": self.late,
+            "target_ms": self.target_ms,
+            "last_ms": self.last_ms,
+            "avg_ms": self._total_ms / self.rendered if self.rendered else 0.0,
+            "max_ms": self.max_ms,
+        }
\ No newline at end of file
@@ -1,7 +1,13 @@
+import mmap
 import os
+import sys
+import threading
+import uuid
+import weakref
+from collections import OrderedDict
 import numpy as np
 import cv2
-from PySide6 import QtGui
+from .instrument import span
 
 
 def clamp01(x):
@@ -19,30 +25,165 @@ def ensure_bgr_u8(img):
     return img
 
 
+def frozen(img):
+    # read-only and owning its pixels, or a read-only view all the way down to a read-only
+    # file mapping (project chunks, np.load(mmap_mode="r")): the contents can never change
+    if img.flags.writeable:
+        return False
+    if img.flags.owndata:
+        return True
+    base = img.base
+    while isinstance(base, np.ndarray):
+        if base.flags.writeable:
+            return False  # a read-only view of pixels someone else can write
+        base = base.base
+    if not isinstance(base, mmap.mmap):
+        return False
+    try:
+        with memoryview(base) as view:
+            return view.readonly
+    except ValueError:  # closed
+        return False
+
+
+class IdentityMemo:
+    """Values derived from an array, remembered for as long as that array lives.
+
+    Only frozen arrays (see frozen()) are memoized; for anything else get()
+    just computes. Each array keeps its `per_array` most recently used keys.
+    """
+
+    def __init__(self, per_array=4):
+        self.per_array = per_array
+        self._entries = {}  # id(array) -> (weakref, OrderedDict key -> value)
+        self._lock = threading.Lock()
+
+    def get(self, img, key, compute):
+        if not frozen(img):
+            return compute()
+        ident = id(img)
+        with self._lock:
+            entry = self._entries.get(ident)
+            if entry is not None and entry[0]() is img and key in entry[1]:
+                entry[1].move_to_end(key)
+                return entry[1][key]
+        value = compute()
+        with self._lock:
+            entry = self._entries.get(ident)
+            if entry is None or entry[0]() is not img:
+                ref = weakref.ref(img, lambda _r, k=ident, d=self._entries: d.pop(k, None))
+                entry = self._entries[ident] = (ref, OrderedDict())
+            entry[1][key] = value
+            while len(entry[1]) > self.per_array:
+                entry[1].popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def wrap_qimage(img_bgr):
+    """QImage viewing the array's BGR (or gray) bytes without copying.
+
+    Returns (qimage, buffer); the QImage is only valid while buffer is alive.
+    """
+    from PySide6 import QtGui  # Qt stays optional for headless use of ops/utils
+    if img_bgr.dtype != np.uint8 or img_bgr.ndim == 3 and img_bgr.shape[2] != 3:
+        img_bgr = ensure_bgr_u8(img_bgr[..., :3] if img_bgr.ndim == 3 else img_bgr)
+    buf = np.ascontiguousarray(img_bgr)
+    h, w = buf.shape[:2]
+    fmt = QtGui.QImage.Format.Format_Grayscale8 if buf.ndim == 2 else QtGui.QImage.Format.Format_BGR888
+    return QtGui.QImage(buf.data, w, h, buf.strides[0], fmt), buf
+
+
 def to_qimage(img_bgr):
-    img_bgr = ensure_bgr_u8(img_bgr)
-    h, w, _ = img_bgr.shape
-    img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
-    qimg = QtGui.QImage(img_rgb.data, w, h, 3 * w, QtGui.QImage.Format.Format_RGB888)
-    return qimg.copy()
+    qimg, _buf = wrap_qimage(img_bgr)
+    return qimg.copy()  # owns its pixels
+
+
+_bgra = [None]  # reusable upload buffer (pixmaps are only built on the GUI thread)
 
 
 def qpixmap_from_bgr(img_bgr):
-    return QtGui.QPixmap.fromImage(to_qimage(img_bgr))
+    from PySide6 import QtGui
+    if img_bgr.dtype == np.uint8 and img_bgr.ndim == 3 and img_bgr.shape[2] == 3 and sys.byteorder == "little":
+        # BGRA bytes are Qt's native RGB32 on little-endian hosts, so fromImage
+        # is a straight copy instead of a per-pixel format conversion
+        h, w = img_bgr.shape[:2]
+        buf = _bgra[0]
+        if buf is None or buf.shape[:2] != (h, w):
+            buf = _bgra[0] = np.empty((h, w, 4), np.uint8)
+        with span("to_bgra", "convert"):
+            cv2.cvtColor(img_bgr, cv2.COLOR_BGR2BGRA, dst=buf)
+        with span("QPixmap.fromImage", "upload"):
+            return QtGui.QPixmap.fromImage(QtGui.QImage(buf.data, w, h, 4 * w, QtGui.QImage.Format.Format_RGB32))
+    with span("wrap_qimage", "convert"):
+        qimg, _buf = wrap_qimage(img_bgr)  # _buf keeps the pixels alive through the upload
+    with span("QPixmap.fromImage", "upload"):
+        return QtGui.QPixmap.fromImage(qimg)
 
 
-def load_image(path):
-    # robust to unicode paths
-    return cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+_REDUCED = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4,
+            8: cv2.IMREAD_REDUCED_COLOR_8}
 
 
-def save_image(path, img_bgr):
-    ext = os.path.splitext(path)[1].lower() or ".png"
-    params = []
+def load_image(path, reduce=1):
+    """Decode path as BGR uint8 (None if unreadable); reduce=2/4/8 decodes at 1/reduce size.
+
+    Any other reduce raises ValueError.
+
+    The file is memory-mapped rather than read into a buffer, so the only
+    large allocation is the decoded image. JPEG decodes natively at reduced
+    sizes, which makes reduce>1 much faster for previews.
+    """
+    if reduce not in _REDUCED:
+        raise ValueError(f"unsupported reduce factor {reduce!r} (choose from {', '.join(map(str, _REDUCED))})")
+    # opening through Python keeps unicode paths working on every platform
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            data = np.frombuffer(mm, dtype=np.uint8)
+            try:
+                return cv2.imdecode(data, _REDUCED[reduce])
+            finally:
+                del data  # the map cannot close while a view is exported
+    except (OSError, ValueError):  # missing or empty file
+        return None
+
+
+def encode_params(ext):
+    ext = ext.lower()
     if ext in (".jpg", ".jpeg"):
-        params = [int(cv2.IMWRITE_JPEG_QUALITY), 95]
-    ok, buf = cv2.imencode(ext, ensure_bgr_u8(img_bgr), params)
-    if not ok:
-        raise RuntimeError("imencode failed")
-    with open(path, "wb") as f:
-        f.write(buf.tobytes())
\ No newline at end of file
+        return [int(cv2.IMWRITE_JPEG_QUALITY), 95]
+    return []
+
+
+def save_image(path, img_bgr, params=None):
+    """Write atomically: encode into a temp file next to path, then rename over it.
+
+    cv2.imwrite streams the encoder output to the file instead of building the
+    whole encoded image in memory; imencode is the fallback for paths OpenCV
+    cannot open (non-ASCII directories on Windows).
+    """
+    ext = os.path.splitext(path)[1].lower() or ".png"
+    params = encode_params(ext) if params is None else list(params)
+    img = ensure_bgr_u8(img_bgr)
+    # created exclusively under a unique name, with the default (umask) permissions of a new file
+    tmp = os.path.join(os.path.dirname(os.path.abspath(path)), f".artfusion-{uuid.uuid4().hex}{ext}")
+    open(tmp, "xb").close()
+    try:
+        try:
+            ok = cv2.imwrite(tmp, img, params)
+        except cv2.error:
+            ok = False
+        if not ok:
+            ok, buf = cv2.imencode(ext, img, params)
+            if not ok:
+                raise RuntimeError("imencode failed")
+            with open(tmp, "wb") as f:
+                f.write(buf)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
\ No newline at end of file
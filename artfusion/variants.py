@@ -0,0 +1,187 @@
+import argparse
+import math
+import os
+import sys
+import numpy as np
+import cv2
+from .ops import SEPIA, Ops, _glow_blur, _vignette_mask
+from .blend import KERNELS, MODES, BlendScratch
+from .utils import load_image, save_image
+
+THUMB = 256  # long side of a variant thumbnail, in pixels
+STRENGTHS = (0.2, 0.4, 0.6, 0.8, 1.0)
+GLOW_AMOUNTS = (0.2, 0.4, 0.6, 0.8, 1.0, 1.5)
+ADJUST_PRESETS = {
+    "Neutre": {},
+    "Doux": {"contrast": 0.85, "saturation": 0.9, "gamma": 1.1},
+    "Contraste": {"contrast": 1.35, "gamma": 0.95},
+    "Vif": {"contrast": 1.15, "saturation": 1.5},
+    "Lumineux": {"brightness": 25, "gamma": 1.15},
+    "Sombre": {"brightness": -25, "contrast": 1.1},
+    "Chaud": {"hue": -6, "saturation": 1.2},
+    "Froid": {"hue": 8, "saturation": 0.9},
+    "Delave": {"contrast": 0.7, "saturation": 0.5, "brightness": 15},
+}
+FAMILIES = ("blend", "sepia", "vignette", "glow", "adjust")
+
+
+def variants(family, alpha=0.5):
+    """[(label, op, params)] for a family; every op is the Ops method of that name."""
+    if family == "blend":
+        return [(mode, "blend", {"mode": mode, "alpha": alpha}) for mode in MODES]
+    if family in ("sepia", "vignette"):
+        return [(f"{family} {s:g}", family, {"strength": s}) for s in STRENGTHS]
+    if family == "glow":
+        return [(f"glow {a:g}", "glow", {"amount": a}) for a in GLOW_AMOUNTS]
+    if family == "adjust":
+        return [(name, "adjust", dict(p)) for name, p in ADJUST_PRESETS.items()]
+    raise ValueError(f"unknown family '{family}' (choose from {', '.join(FAMILIES)})")
+
+
+def thumbnail(img, size=THUMB, shape=None):
+    """img downscaled (INTER_AREA) to `size` on its long side, or to shape (h, w)."""
+    h, w = img.shape[:2]
+    if shape is None:
+        s = min(1.0, size / max(h, w))
+        shape = (max(1, round(h * s)), max(1, round(w * s)))
+    if shape == (h, w):
+        return img
+    return cv2.resize(img, (shape[1], shape[0]), interpolation=cv2.INTER_AREA)
+
+
+# --- Batched renderers: shared intermediates computed once, variants along axis 0 ---
+def _blend_batch(img, other, modes, alpha):
+    # float inputs converted once; each mode's kernel runs on copies of them
+    fa = np.divide(img, np.float32(255.0), dtype=np.float32)
+    fb = np.divide(other, np.float32(255.0), dtype=np.float32)
+    out = np.empty((len(modes),) + img.shape, np.float32)
+    a, b, t, u, m = BlendScratch().views(img.shape)
+    for i, mode in enumerate(modes):
+        np.copyto(a, fa); np.copyto(b, fb)
+        KERNELS.get(mode, KERNELS["normal"])(a, b, alpha, t, u, m)
+        out[i] = a
+    out *= 255
+    return out.astype(np.uint8)  # truncates like Ops.blend
+
+
+def _sepia_batch(img, strengths):
+    # the sepia matrix product once, then every strength in one broadcast mix
+    y = np.clip(img.astype(np.float32) @ SEPIA.T, 0, 255).astype(np.uint8).astype(np.float32)
+    s = np.asarray(strengths, np.float32)[:, None, None, None]
+    out = img.astype(np.float32)[None] * (1 - s) + y[None] * s
+    return np.clip(np.rint(out), 0, 255).astype(np.uint8)
+
+
+def _vignette_batch(img, strengths):
+    # Ops.vignette's own (cached) masks, one per strength along axis 0
+    h, w = img.shape[:2]
+    masks = np.stack([_vignette_mask(h, w, s) for s in strengths])
+    if img.ndim == 3:
+        masks = masks[..., None]
+    return np.multiply(img[None], masks, dtype=np.float32).astype(np.uint8)
+
+
+def _glow_batch(img, amounts, blur_ks=21):
+    # one blur shared by every amount
+    blur = _glow_blur(img, blur_ks).astype(np.float32)
+    a = np.asarray(amounts, np.float32)[:, None, None, None]
+    out = img.astype(np.float32)[None] + blur[None] * a
+    return np.clip(np.rint(out), 0, 255).astype(np.uint8)
+
+
+def render(img, family, other=None, size=THUMB, alpha=0.5, full_width=None):
+    """[(label, op, params, thumbnail)] for every variant of family.
+
+    Variants are rendered on a thumbnail of img (at most `size` px on the long
+    side); "blend" needs `other`, which is scaled to the thumbnail's size once.
+    full_width is the width of the image the params will be applied to (img's
+    own by default, pass it when img is already a proxy): pixel-sized params
+    shrink with the thumbnail, while the returned params stay full-resolution.
+    """
+    vs = variants(family, alpha)
+    small = thumbnail(img, size)
+    scale = small.shape[1] / (full_width or img.shape[1])
+    params = [p for _, _, p in vs]
+    if family == "blend":
+        if other is None:
+            raise ValueError("blend variants need a second image")
+        outs = _blend_batch(small, thumbnail(other, shape=small.shape[:2]), [p["mode"] for p in params], alpha)
+    elif family == "sepia":
+        outs = _sepia_batch(small, [p["strength"] for p in params])
+    elif family == "vignette":
+        outs = _vignette_batch(small, [p["strength"] for p in params])
+    elif family == "glow":
+        outs = _glow_batch(small, [p["amount"] for p in params], blur_ks=max(1, int(21 * scale) | 1))
+    else:
+        outs = [getattr(Ops, op)(small, **p) for _, op, p in vs]
+    return [(label, op, p, out) for (label, op, p), out in zip(vs, outs)]
+
+
+def contact_sheet(items, cols=None, pad=8, label_h=22, background=(30, 30, 30)):
+    """Grid of (label, thumbnail) with each label under its thumbnail."""
+    n = len(items)
+    cols = cols or math.ceil(math.sqrt(n))
+    rows = math.ceil(n / cols)
+    cw = max(t.shape[1] for _, t in items)
+    ch = max(t.shape[0] for _, t in items)
+    sheet = np.empty((pad + rows * (ch + label_h + pad), pad + cols * (cw + pad), 3), np.uint8)
+    sheet[:] = background
+    for i, (label, t) in enumerate(items):
+        if t.ndim == 2:
+            t = cv2.cvtColor(t, cv2.COLOR_GRAY2BGR)
+        x = pad + (i % cols) * (cw + pad)
+        y = pad + (i // cols) * (ch + label_h + pad)
+        oy, ox = (ch - t.shape[0]) // 2, (cw - t.shape[1]) // 2
+        sheet[y + oy:y + oy + t.shape[0], x + ox:x + ox + t.shape[1]] = t
+        cv2.putText(sheet, label, (x + 2, y + ch + label_h - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (220, 220, 220), 1,
+                    cv2.LINE_AA)
+    return sheet
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m artfusion.variants",
+                                 description="Render parameter variants of an image as a contact sheet.",
+                                 epilog="Families: " + ", ".join(FAMILIES) + ".")
+    ap.add_argument("image", help="input image")
+    ap.add_argument("-o", "--out", required=True, help="contact sheet file")
+    ap.add_argument("-f", "--family", nargs="+", default=["adjust"], choices=FAMILIES, help="variant families")
+    ap.add_argument("--other", default=None, help="second image, required by the blend family")
+    ap.add_argument("--alpha", type=float, default=0.5, help="opacity of the blend variants")
+    ap.add_argument("--size", type=int, default=THUMB, help="thumbnail long side in pixels")
+    ap.add_argument("--cols", type=int, default=None, help="thumbnails per row (default: square grid)")
+    ap.add_argument("--each", default=None, help="also write every variant at full resolution to this directory")
+    args = ap.parse_args(argv)
+
+    img = load_image(args.image)
+    if img is None:
+        ap.error(f"cannot read {args.image}")
+    other = None
+    if args.other:
+        other = load_image(args.other)
+        if other is None:
+            ap.error(f"cannot read {args.other}")
+    elif "blend" in args.family:
+        ap.error("the blend family needs --other")
+    items = [v for family in args.family for v in render(img, family, other, args.size, args.alpha)]
+    save_image(args.out, contact_sheet([(label, t) for label, _, _, t in items], args.cols))
+    print(f"{len(items)} variants -> {args.out}")
+    if args.each:
+        from .export import ExportQueue
+        os.makedirs(args.each, exist_ok=True)
+        stem, ext = os.path.splitext(os.path.basename(args.image))
+        queue = ExportQueue()
+        jobs = queue.submit_many(
+            (getattr(Ops, op)(img, *((other,) if op == "blend" else ()), **p),
+             os.path.join(args.each, f"{stem}-{label.replace(' ', '_')}{ext}"))
+            for label, op, p, _ in items)
+        queue.wait(); queue.shutdown()
+        failed = [j for j in jobs if j.status != "done"]
+        for j in failed:
+            print(f"FAIL {j.path}: {j.error}")
+        print(f"{len(jobs) - len(failed)} full-resolution variants -> {args.each}")
+        return 1 if failed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file